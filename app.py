@@ -5,39 +5,10 @@
 #--------------------------------------------------
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
 import preprocess as pp
-
-from sklearn.model_selection import (
-    GridSearchCV,
-    train_test_split)
-
-from sklearn.ensemble import (
-    RandomForestClassifier,
-    HistGradientBoostingClassifier)
-
-from sklearn.metrics import (
-    confusion_matrix,
-    classification_report,
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score)
-
-from sklearn.impute import SimpleImputer
-
-from sklearn.preprocessing import (
-    StandardScaler,
-    MinMaxScaler)
-
-from sklearn.neural_network import MLPClassifier
-
-from sklearn.inspection import permutation_importance
-
-from imblearn.over_sampling import SMOTE
+import inference
+import batching
+import cache
 #--------------------------------------------------
 
 # ------------------------- Page Setup -------------------------
@@ -50,7 +21,7 @@ st.title("🎓 Predict Student Dropout / Success")
 
 # ------------------------- Model Selection -------------------------
 st.sidebar.header("Model Settings")
-model_choice = st.sidebar.selectbox("Choose Model", ["RandomForest", "ANN", "HistGradientBoosting"])
+model_choice = st.sidebar.selectbox("Choose Model", ["RandomForest", "ANN", "HistGradientBoosting", inference.ENSEMBLE])
 
 # ------------------------- Helpers -------------------------
 def get_key(mapping, value):
@@ -179,66 +150,26 @@ if submitted:
 
     st.title("🧠 Prediction Result")
 
-# ------------------------- RandomForest -------------------------
+# ------------------------- Model -------------------------
     pred = None
     proba = None
-    
-    if model_choice == "RandomForest":
-        #process stud
-        stud = pp.rfPreProc(stud)
-    
-        #reindex
-        rf_columns = joblib.load("models/model_rf_columns.pkl")
-        stud = stud.reindex(columns=rf_columns, fill_value=0)
-    
-        #reimpute
-        rf_imputer = joblib.load("models/model_rf_imputer.pkl")
-        stud_imp = pd.DataFrame(rf_imputer.transform(stud), columns=rf_columns)
-    
-        #predict
-        model_rf = joblib.load("models/model_rf.pkl")
-        pred = model_rf.predict(stud_imp)[0]
-        proba = model_rf.predict_proba(stud_imp)[0]
-
-# ------------------------- ANN -------------------------
-    elif model_choice == "ANN":
-        #get scale
-        pp.scale_ann = joblib.load("models/model_ann_scalers.pkl")
-    
-        #process stud
-        stud = pp.annPreProc(stud)
-    
-        #reindex
-        preproc_columns = joblib.load("models/model_ann_columns.pkl")
-        stud = stud.reindex(columns=preproc_columns, fill_value=0)
-
-        stud = stud.fillna(0)
-        #predict
-        model_ann = joblib.load("models/model_ann.pkl")
-        pred = model_ann.predict(stud)[0]
-        proba = model_ann.predict_proba(stud)[0]
-
-# ------------------------- HistGradientBoosting -------------------------
-    elif model_choice == "HistGradientBoosting":
-        #process stud
-        stud = pp.hgbPreProc(stud)
-    
-        #reindex
-        hgb_columns = joblib.load("models/model_hgb_columns.pkl")
-        stud = stud.reindex(columns=hgb_columns, fill_value=0)
-    
-        #reimpute
-        hgb_imputer = joblib.load("models/model_hgb_imputer.pkl")
-        stud = pd.DataFrame(hgb_imputer.transform(stud), columns=hgb_columns)
-    
-        #predict
-        model_hgb = joblib.load("models/model_hgb.pkl")
-        pred = model_hgb.predict(stud)[0]
-        proba = model_hgb.predict_proba(stud)[0]
-# ------------------------- else -------------------------
+    per_model = {}
+
+    if model_choice == inference.ENSEMBLE:
+        #features are built once and the models scored in parallel
+        pred, proba, per_model = cache.PREDICTIONS.getOrCompute(
+            model_choice, stud, lambda: inference.predictStudentEnsemble(stud), kind="ensemble")
+    elif model_choice in inference.MODEL_NAMES:
+        #concurrent sessions are coalesced into one predict call per model
+        pred, proba = cache.PREDICTIONS.predict(model_choice, stud, lambda name, df: batching.getBatcher(name).predict(df))
+        pred, proba = pred[0], proba[0]
     else:
         st.error("❌ Invalid model selection.")
 # ------------------------- success -------------------------
 
     st.success(f"🎯 Prediction: `{pp.targetMapReverse[pred]}`")
-    st.write("📊 Probability:", {pp.targetMapReverse[i]: round(p * 100, 2) for i, p in enumerate(proba)})
\ No newline at end of file
+    st.write("📊 Probability:", {pp.targetMapReverse[i]: round(p * 100, 2) for i, p in enumerate(proba)})
+
+    if per_model:
+        st.write("🗳️ Per model:", pd.DataFrame(
+            {name: {pp.targetMapReverse[i]: round(p * 100, 2) for i, p in enumerate(model_proba)} for name, (_, model_proba) in per_model.items()}).T)
@@ -0,0 +1,145 @@
+# batching.py
+# Request coalescing in front of the models. Concurrent callers submit their
+# rows, a worker gathers whatever arrives within max_wait_ms (up to
+# max_batch_size rows) and scores it with one inference.predictBatch call,
+# then hands each caller back its own slice. If that call fails, the requests
+# are scored one by one and only the failing one gets the error. getBatcher
+# keeps one batcher per model and refuses to hand it out under other options.
+
+
+#import
+#--------------------------------------------------
+import collections
+import inspect
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import inference
+#--------------------------------------------------
+
+#batcher
+#--------------------------------------------------
+class MicroBatcher:
+    def __init__(self, model_name, max_batch_size=64, max_wait_ms=5, workers=1, score=inference.predictBatch, stats_window=10_000):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._score = score
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = collections.deque(maxlen=stats_window)
+        self._queue_delays = collections.deque(maxlen=stats_window)
+        self._requests = 0
+
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"batcher-{model_name}-{i}", daemon=True).start()
+
+    def submit(self, df):
+        future = Future()
+        self._queue.put((df, future, time.perf_counter()))
+        return future
+
+    def predict(self, df):
+        return self.submit(df).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            with self._lock:
+                self._requests += len(batch)
+                self._batch_sizes.append(sum(len(df) for df, _, _ in batch))
+                self._queue_delays.extend(started - submitted for _, _, submitted in batch)
+
+            try:
+                pred, proba = self._score(self.model_name, pd.concat([df for df, _, _ in batch], ignore_index=True))
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._scoreEach(batch)
+                continue
+
+            offset = 0
+            for df, future, _ in batch:
+                future.set_result((pred[offset:offset + len(df)], proba[offset:offset + len(df)]))
+                offset += len(df)
+
+    def _scoreEach(self, batch):
+        #the joined batch failed: score each request on its own, so only the
+        #caller whose rows caused it gets the error
+        for df, future, _ in batch:
+            try:
+                future.set_result(self._score(self.model_name, df))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self):
+        with self._lock:
+            sizes = np.array(self._batch_sizes)
+            delays = np.array(self._queue_delays) * 1000
+            requests = self._requests
+        if not len(sizes):
+            return {"requests": requests, "batches": 0}
+        return {
+            "requests": requests,
+            "batches": len(sizes),
+            "meanBatchSize": float(sizes.mean()),
+            "maxBatchSize": int(sizes.max()),
+            "queueDelayP50Ms": float(np.percentile(delays, 50)),
+            "queueDelayP99Ms": float(np.percentile(delays, 99)),
+        }
+
+
+#one batcher per model for the whole process, shared like the model registry
+_batchers = {} #model name -> (options it was created with, batcher)
+_batchers_lock = threading.Lock()
+
+def batcherOptions(model_name, **kwargs):
+    arguments = inspect.signature(MicroBatcher).bind(model_name, **kwargs)
+    arguments.apply_defaults()
+    return arguments.arguments
+
+def getBatcher(model_name, **kwargs):
+    #the first call creates the batcher; later calls may leave the options out,
+    #but asking for different ones is an error rather than silently ignored
+    options = batcherOptions(model_name, **kwargs)
+    with _batchers_lock:
+        if model_name not in _batchers:
+            _batchers[model_name] = (options, MicroBatcher(model_name, **kwargs))
+        created, batcher = _batchers[model_name]
+    if kwargs and options != created:
+        changed = [name for name in options if created[name] != options[name]]
+        existing = ", ".join(f"{name}={created[name]!r}" for name in changed)
+        asked = ", ".join(f"{name}={options[name]!r}" for name in changed)
+        raise ValueError(f"{model_name} batcher already exists with {existing}, asked for {asked}")
+    return batcher
+
+def batcherStats():
+    with _batchers_lock:
+        batchers = {name: batcher for name, (_, batcher) in _batchers.items()}
+    return {name: batcher.stats() for name, batcher in batchers.items()}
+#--------------------------------------------------
@@ -0,0 +1,691 @@
+# bench.py
+
+
+#import
+#--------------------------------------------------
+import argparse
+import subprocess
+import sys
+import time
+#--------------------------------------------------
+
+#budgets
+#--------------------------------------------------
+#self time of "import preprocess", excluding the libraries it imports
+PREPROCESS_IMPORT_BUDGET_MS = 20
+
+#modules that must not be pulled in by "import inference"
+TRAINING_ONLY_MODULES = [
+    "matplotlib",
+    "seaborn",
+    "imblearn",
+    "sklearn.metrics",
+    "sklearn.model_selection",
+    "sklearn.inspection",
+    "sklearn.neural_network",
+]
+
+#what app.py and preprocess.py imported before the inference split
+LEGACY_IMPORTS = """
+import pandas, numpy, joblib
+import matplotlib.pyplot, seaborn
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import confusion_matrix, classification_report
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from sklearn.neural_network import MLPClassifier
+from sklearn.inspection import permutation_importance
+from imblearn.over_sampling import SMOTE
+"""
+
+#single-record /predict latency under SERVER_CLIENTS concurrent clients
+SERVER_CLIENTS = 4
+SERVER_P50_TARGET_MS = 80
+SERVER_P99_TARGET_MS = 150
+
+#trees of the RandomForest fitted when models/model_rf.pkl is missing
+RF_BENCH_TREES = 100
+#--------------------------------------------------
+
+#helpers
+#--------------------------------------------------
+def importSelfTimeMs(module):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True).stderr
+    for line in out.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[0].split(":")[-1]) / 1000
+    raise RuntimeError(f"no importtime entry for {module!r}")
+
+def coldStartMs(code, repeats=3):
+    best = None
+    for _ in range(repeats):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        elapsed = (time.perf_counter() - t) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+_FITTED = {}
+
+def modelFiles(model_name, tmp):
+    #the model's pickles. models/model_rf.pkl is not in the tree, so instead of
+    #skipping the RF, train.py's pipeline fits a smaller forest (RF_BENCH_TREES)
+    #on the cached features and its pickles are written to tmp
+    import os
+    import joblib
+    import inference
+
+    files = inference.MODEL_FILES[model_name]
+    if model_name != "RandomForest" or os.path.exists(files["model"]):
+        return files
+    if model_name not in _FITTED:
+        import preprocess as pp
+        import dataset
+        import train
+        feat = dataset.features()
+        params = {**train.MODEL_PARAMS[model_name], "n_estimators": RF_BENCH_TREES}
+        _FITTED[model_name], _ = train.rfTrainEval(pp.rfFromFeatures(feat), train.splitIndices(feat["targetInt"]), **params)
+        print(f"{model_name:<40}: {files['model']} missing, fitted {RF_BENCH_TREES} trees instead")
+    files = {kind: os.path.join(tmp, os.path.basename(path)) for kind, path in files.items()}
+    for kind, path in files.items():
+        joblib.dump(_FITTED[model_name][kind], path)
+    return files
+
+def picklesReadOnce(model_name, files=None):
+    #fresh interpreter: how often loadPickles reads each of the model's pickles
+    probe = (
+        "import collections, joblib, inference, registry; reads = collections.Counter(); "
+        "registry.REGISTRY._loader = lambda path: reads.update([path]) or joblib.load(path); "
+        f"inference.loadPickles({model_name!r}, {files!r}); inference.loadPickles({model_name!r}, {files!r}); "
+        "print(max(reads.values()))")
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    return int(out.split()[-1]) == 1
+
+def bestMs(fn, repeats):
+    best = None
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - t) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def reportBudget(label, value_ms, budget_ms):
+    status = "OK" if value_ms <= budget_ms else "OVER BUDGET"
+    print(f"{label:<40}: {value_ms:9.2f} ms (budget {budget_ms} ms) {status}")
+    return value_ms <= budget_ms
+#--------------------------------------------------
+
+#benchmarks
+#--------------------------------------------------
+def benchImport():
+    ok = reportBudget("import preprocess (self)", importSelfTimeMs("preprocess"), PREPROCESS_IMPORT_BUDGET_MS)
+
+    #fresh interpreter, so an earlier benchmark can't have loaded the dataset already
+    probe = (
+        "import time, preprocess as pp; "
+        "loaded = pp.loadDataset.cache_info().currsize > 0; "
+        "t = time.perf_counter(); pp.DF; first = time.perf_counter() - t; "
+        "t = time.perf_counter(); pp.DF; cached = time.perf_counter() - t; "
+        "print(loaded, first * 1000, cached * 1000)")
+    loaded, first_ms, cached_ms = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout.split()
+    print(f"{'dataset loaded at import':<40}: {loaded}")
+    print(f"{'first DF access':<40}: {float(first_ms):9.2f} ms")
+    print(f"{'cached DF access':<40}: {float(cached_ms):9.2f} ms")
+
+    #DF_INIT comes from the columnar cache but must stay writable like a read_csv frame
+    writable = subprocess.run(
+        [sys.executable, "-c", "import preprocess as pp; pp.DF_INIT.loc[0, 'Course'] = 33"],
+        capture_output=True).returncode == 0
+    print(f"{'DF_INIT writable':<40}: {writable}")
+    return ok and loaded == "False" and writable
+
+def benchStartup():
+    legacy = coldStartMs(LEGACY_IMPORTS)
+    current = coldStartMs("import inference")
+    print(f"{'legacy imports (cold start)':<40}: {legacy:9.2f} ms")
+    print(f"{'import inference (cold start)':<40}: {current:9.2f} ms")
+    print(f"{'reduction':<40}: {(1 - current / legacy) * 100:9.2f} %")
+
+    check = (
+        "import sys, inference; "
+        f"print(','.join(m for m in {TRAINING_ONLY_MODULES!r} if m in sys.modules))")
+    leaked = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout.strip()
+    print(f"{'training-only modules imported':<40}: {leaked or 'none'}")
+    return not leaked
+
+def benchYear(rows=100_000):
+    import numpy as np
+    import preprocess as pp
+
+    df = pp.DF_INIT.rename(columns=pp.conversion_dict).sample(n=rows, replace=True, random_state=42)
+    econ = df[["unemploymentRate", "inflationRate", "gdp"]]
+
+    t = time.perf_counter()
+    legacy = econ.apply(lambda row: pp.econ_to_year.get((row["unemploymentRate"], row["inflationRate"], row["gdp"])), axis=1)
+    legacy_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    year = pp.lookupYear({col: econ[col].to_numpy() for col in econ.columns})
+    vector_s = time.perf_counter() - t
+
+    same = np.array_equal(legacy.to_numpy(dtype=float), year, equal_nan=True)
+    print(f"{'year lookup, df.apply':<40}: {rows / legacy_s:12,.0f} rows/s")
+    print(f"{'year lookup, packed key index':<40}: {rows / vector_s:12,.0f} rows/s ({legacy_s / vector_s:.0f}x)")
+    print(f"{'results identical':<40}: {same}")
+    return same
+
+def startServer(**options):
+    import asyncio
+    import threading
+    from server import PredictionServer
+
+    app = PredictionServer(**options)
+    app.preload()
+    ready = threading.Event()
+    port = []
+
+    def run():
+        asyncio.run(app.serve(port=0, ready=lambda p: (port.append(p), ready.set())))
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return app, port[0]
+
+def benchServer(model_name="HistGradientBoosting", requests=1000, concurrency=SERVER_CLIENTS):
+    import http.client
+    import json
+    import numpy as np
+    import preprocess as pp
+    import batching
+    from concurrent.futures import ThreadPoolExecutor
+
+    #cache off: the clients replay the same students, this measures the model path
+    _, port = startServer(cache_size=0)
+    students = pp.DF_INIT.drop(columns=["Target"]).rename(columns=pp.conversion_dict).to_dict("records")
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        latencies = []
+        for i in range(n):
+            body = json.dumps({"model": model_name, "students": [students[i % len(students)]]})
+            t = time.perf_counter()
+            conn.request("POST", "/predict", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - t)
+            if response.status != 200:
+                raise RuntimeError(f"/predict returned {response.status}")
+        conn.close()
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(client, [requests // concurrency] * concurrency))
+    elapsed = time.perf_counter() - start
+
+    ms = np.concatenate(results) * 1000
+    p50, p99 = np.percentile(ms, 50), np.percentile(ms, 99)
+    print(f"{'server ' + model_name:<40}: {len(ms) / elapsed:9.0f} req/s, {concurrency} clients")
+    batches = batching.batcherStats()[model_name]
+    print(f"{'mean / max batch size':<40}: {batches['meanBatchSize']:9.2f} / {batches['maxBatchSize']}")
+    print(f"{'queue delay p50 / p99':<40}: {batches['queueDelayP50Ms']:9.2f} / {batches['queueDelayP99Ms']:.2f} ms")
+    ok = reportBudget("server p50", p50, SERVER_P50_TARGET_MS)
+    ok = reportBudget("server p99", p99, SERVER_P99_TARGET_MS) and ok
+    return ok
+
+def benchScore(repeats=200):
+    import numpy as np
+    import preprocess as pp
+    import inference
+
+    stud = pp.DF_USE.drop(columns=["Target"]).iloc[[0]]
+    ok = True
+    for model_name in inference.MODEL_NAMES:
+        try:
+            artifacts = inference.loadArtifacts(model_name)
+        except FileNotFoundError:
+            print(f"{model_name:<40}: skipped, artifacts missing")
+            continue
+        model = artifacts["model"]
+        X = inference.preprocessStudent(model_name, stud, artifacts)
+
+        t = time.perf_counter()
+        for _ in range(repeats):
+            legacy = (model.predict(X), model.predict_proba(X))
+        legacy_ms = (time.perf_counter() - t) / repeats * 1000
+
+        t = time.perf_counter()
+        for _ in range(repeats):
+            current = inference.scoreModel(model, X)
+        current_ms = (time.perf_counter() - t) / repeats * 1000
+
+        same = np.array_equal(legacy[0], current[0]) and np.array_equal(legacy[1], current[1])
+        print(f"{model_name + ' predict+proba':<40}: {legacy_ms:9.3f} ms")
+        print(f"{model_name + ' scoreModel':<40}: {current_ms:9.3f} ms ({legacy_ms / current_ms:.2f}x), identical: {same}")
+        ok = ok and same
+    return ok
+
+def benchEnsemble(rows=1, repeats=50):
+    import numpy as np
+    import preprocess as pp
+    import inference
+
+    df = pp.DF_USE.drop(columns=["Target"]).iloc[:rows]
+    available = []
+    for model_name in inference.MODEL_NAMES:
+        try:
+            inference.loadArtifacts(model_name)
+            available.append(model_name)
+        except FileNotFoundError:
+            print(f"{model_name:<40}: skipped, artifacts missing")
+    inference.predictEnsemble(df)
+
+    single = {}
+    for model_name in available:
+        t = time.perf_counter()
+        for _ in range(repeats):
+            inference.predictBatch(model_name, df)
+        single[model_name] = (time.perf_counter() - t) / repeats * 1000
+        print(f"{model_name + ' alone':<40}: {single[model_name]:9.3f} ms")
+
+    t = time.perf_counter()
+    for _ in range(repeats):
+        pred, proba, per_model = inference.predictEnsemble(df)
+    ensemble_ms = (time.perf_counter() - t) / repeats * 1000
+
+    print(f"{'sum of single models':<40}: {sum(single.values()):9.3f} ms")
+    print(f"{'slowest single model':<40}: {max(single.values()):9.3f} ms")
+    print(f"{'ensemble (' + str(len(per_model)) + ' models)':<40}: {ensemble_ms:9.3f} ms")
+
+    #the ensemble has to land closer to the slowest model than to the sum
+    slowest, total = max(single.values()), sum(single.values())
+    fast = len(single) < 2 or ensemble_ms - slowest < 0.5 * (total - slowest)
+    print(f"{'closer to slowest than to sum':<40}: {fast}")
+
+    mean = np.mean([p for _, p in per_model.values()], axis=0)
+    same = np.allclose(proba, mean) and np.array_equal(pred, inference.CLASSES[mean.argmax(axis=1)])
+    print(f"{'matches mean of per-model proba':<40}: {same}")
+    return same and fast
+
+def benchCache(model_name="HistGradientBoosting", rows=2000):
+    import os
+    import numpy as np
+    import preprocess as pp
+    import inference
+    from cache import PredictionCache
+
+    df = pp.DF_INIT.drop(columns=["Target"]).iloc[:rows]
+    predictions = PredictionCache()
+    inference.predictBatch(model_name, df.iloc[:1])
+
+    t = time.perf_counter()
+    expected = inference.predictBatch(model_name, df)
+    direct_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    predictions.predict(model_name, df)
+    cold_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    warm = predictions.predict(model_name, df)
+    warm_s = time.perf_counter() - t
+
+    same = np.array_equal(expected[0], warm[0]) and np.array_equal(expected[1], warm[1])
+    print(f"{'predictBatch':<40}: {rows / direct_s:12,.0f} rows/s")
+    print(f"{'cache cold':<40}: {rows / cold_s:12,.0f} rows/s")
+    print(f"{'cache warm':<40}: {rows / warm_s:12,.0f} rows/s ({direct_s / warm_s:.1f}x)")
+    print(f"{'results identical':<40}: {same}")
+
+    #touching a model file must drop its entries
+    path = inference.MODEL_FILES[model_name]["model"]
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    try:
+        predictions.predict(model_name, df.iloc[:1])
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    stats = predictions.stats()
+    print(f"{'hit rate / invalidated on file change':<40}: {stats['hitRate']:9.2f} / {stats['invalidations']}")
+    return same and stats["invalidations"] > 0
+
+def benchImportance(model_name="HistGradientBoosting"):
+    import numpy as np
+    import pandas as pd
+    import preprocess as pp
+    import inference
+    import importance
+    import train
+    from sklearn.inspection import permutation_importance
+
+    artifacts = inference.loadArtifacts(model_name)
+    feat = pp.buildFeatures(pp.DF)
+    _, test_idx = train.splitIndices(feat["targetInt"])
+    X = inference.preprocessStudent(model_name, None, artifacts, feat.iloc[test_idx].drop(columns="targetInt"))
+    y = feat["targetInt"].iloc[test_idx].astype(int)
+
+    t = time.perf_counter()
+    legacy = permutation_importance(artifacts["model"], X, y, n_repeats=10, random_state=42, n_jobs=-1, scoring="f1_macro")
+    legacy_s = time.perf_counter() - t
+    legacy = pd.Series(legacy.importances_mean, index=X.columns)
+
+    results = {}
+    for label, options in [("all repeats", {"tol": 0}), ("early stop", {}), ("grouped + early stop", {"groups": importance.DEFAULT_GROUPS})]:
+        t = time.perf_counter()
+        results[label] = importance.permutationImportance(artifacts["model"], X, y, **options)
+        seconds = time.perf_counter() - t
+        print(f"{'importance, ' + label:<40}: {seconds:9.2f} s ({legacy_s / seconds:.1f}x), {results[label]['Repeats'].sum()} predicts")
+    print(f"{'sklearn permutation_importance':<40}: {legacy_s:9.2f} s")
+
+    early = results["early stop"].set_index("Feature").loc[legacy.index]
+    ours = early["Importance"]
+    corr = np.corrcoef(legacy, ours)[0, 1]
+    rank_corr = legacy.rank().corr(ours.rank())
+    #near-ties may swap places: sklearn's top 3 only has to reach our 3rd
+    #place within two of our standard errors
+    third = ours.nlargest(3).iloc[-1]
+    top = legacy.nlargest(3).index
+    top_within = bool((ours[top] + 2 * early["StdErr"][top] >= third).all())
+    print(f"{'correlation / rank correlation':<40}: {corr:9.3f} / {rank_corr:.3f}")
+    print(f"{'sklearn top 3 within 2 std-err of ours':<40}: {top_within}")
+    return corr > 0.95 and rank_corr > 0.9 and top_within
+
+def benchBundle(repeats=5):
+    import os
+    import tempfile
+    import joblib
+    import numpy as np
+    import preprocess as pp
+    import inference
+    import bundle
+
+    df = pp.DF_USE.drop(columns=["Target"])
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for model_name in inference.MODEL_NAMES:
+            files = modelFiles(model_name, tmp)
+            pickles = inference.loadPickles(model_name, files)
+            path = os.path.join(tmp, os.path.basename(bundle.BUNDLE_FILES[model_name]))
+            manifest = bundle.saveBundle(model_name, pickles, path)
+
+            #both sides as inference gets them, flat engine included
+            def fromPickles():
+                artifacts = {kind: joblib.load(p) for kind, p in files.items()}
+                if model_name in bundle.FLAT_MODELS:
+                    artifacts["flat"] = bundle.FLAT_MODELS[model_name].fromModel(artifacts["model"])
+                return artifacts
+
+            legacy_ms = bestMs(fromPickles, repeats)
+            bundle_ms = bestMs(lambda: bundle.bundleArtifacts(bundle.loadBundle(path)), repeats)
+            artifacts = bundle.bundleArtifacts(bundle.loadBundle(path))
+            pickle_bytes = sum(os.path.getsize(p) for p in files.values())
+
+            same = np.array_equal(
+                inference.scoreModel(pickles["model"], inference.preprocessStudent(model_name, df, pickles))[1],
+                inference.scoreModel(artifacts["model"], inference.preprocessStudent(model_name, df, artifacts))[1])
+            smaller = manifest["bytes"] <= pickle_bytes and bundle_ms <= legacy_ms
+            print(f"{model_name + ' pickles':<40}: {legacy_ms:9.2f} ms, {pickle_bytes:,} bytes in {len(files)} files")
+            print(f"{model_name + ' bundle':<40}: {bundle_ms:9.2f} ms, {manifest['bytes']:,} bytes, hash checked, mmap")
+            print(f"{model_name + ' identical / no bigger, no slower':<40}: {same} / {smaller}")
+            ok = ok and same and smaller
+    return ok
+
+def benchTrees(repeats=50):
+    import tempfile
+    import numpy as np
+    import preprocess as pp
+    import inference
+    import trees
+
+    df = pp.DF_INIT.drop(columns=["Target"])
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for model_name in ["RandomForest", "HistGradientBoosting"]:
+            files = modelFiles(model_name, tmp)
+            artifacts = inference.loadPickles(model_name, files)
+            model = artifacts["model"]
+            t = time.perf_counter()
+            flat = trees.flattenModel(model)
+            flatten_ms = (time.perf_counter() - t) * 1000
+            X = inference.preprocessStudent(model_name, df, artifacts)
+            one, X_np, one_np = X.iloc[[0]], X.to_numpy(), X.to_numpy()[:1]
+
+            same = np.array_equal(model.predict_proba(X), flat.predict_proba(X_np))
+            t = time.perf_counter()
+            for _ in range(repeats):
+                model.predict_proba(one)
+            sklearn_ms = (time.perf_counter() - t) / repeats * 1000
+            t = time.perf_counter()
+            for _ in range(repeats):
+                flat.predict_proba(one_np)
+            flat_ms = (time.perf_counter() - t) / repeats * 1000
+            t = time.perf_counter()
+            model.predict_proba(X)
+            sklearn_batch = time.perf_counter() - t
+            t = time.perf_counter()
+            flat.predict_proba(X_np)
+            flat_batch = time.perf_counter() - t
+
+            #inference routes batches up to FLAT_MAX_ROWS to the flat engine, so it has to win there
+            limit = inference.FLAT_MAX_ROWS[model_name]
+            flat_wins = {}
+            rows = 1
+            while rows <= 1024:
+                flat_wins[rows] = bestMs(lambda: flat.predict_proba(X_np[:rows]), 10) < bestMs(lambda: model.predict_proba(X.iloc[:rows]), 10)
+                rows *= 2
+            crossover = next((rows for rows, wins in flat_wins.items() if not wins), None)
+            routed = flat_wins[limit]
+
+            print(f"{model_name + ' flatten':<40}: {flatten_ms:9.2f} ms, {len(flat.feature):,} nodes, depth {flat.depth}")
+            print(f"{model_name + ' 1 row, sklearn / flat':<40}: {sklearn_ms:9.3f} / {flat_ms:.3f} ms ({sklearn_ms / flat_ms:.0f}x)")
+            print(f"{model_name + ' batch, sklearn / flat':<40}: {len(X) / sklearn_batch:9,.0f} / {len(X) / flat_batch:,.0f} rows/s")
+            print(f"{model_name + ' sklearn faster from / limit':<40}: {crossover or '>1024':>9} / {limit} rows, flat faster at the limit: {routed}")
+            print(f"{model_name + ' bit-identical':<40}: {same} ({len(X)} rows)")
+            once = picklesReadOnce(model_name, files)
+            print(f"{model_name + ' pickles read once':<40}: {once}")
+            ok = ok and same and routed and once
+    return ok
+
+def benchMlp(repeats=200, tol=1e-5):
+    import numpy as np
+    import preprocess as pp
+    import inference
+    artifacts = inference.loadPickles("ANN")
+    model, flat = artifacts["model"], artifacts["flat"]
+    X = inference.preprocessStudent("ANN", pp.DF_INIT.drop(columns=["Target"]), artifacts)
+    X_np = X.to_numpy()
+    one, one_np = X.iloc[[0]], X_np[:1]
+
+    ref = model.predict_proba(X)
+    got = flat.predict_proba(X_np)
+    diff = np.abs(ref - got).max()
+    flips = int((ref.argmax(axis=1) != got.argmax(axis=1)).sum())
+
+    t = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(one)
+    sklearn_ms = (time.perf_counter() - t) / repeats * 1000
+    t = time.perf_counter()
+    for _ in range(repeats):
+        flat.predict_proba(one_np)
+    flat_ms = (time.perf_counter() - t) / repeats * 1000
+    t = time.perf_counter()
+    model.predict_proba(X)
+    sklearn_batch = time.perf_counter() - t
+    t = time.perf_counter()
+    flat.predict_proba(X_np)
+    flat_batch = time.perf_counter() - t
+
+    weights = sum(w.nbytes + b.nbytes for w, b in zip(flat.coefs, flat.intercepts))
+    print(f"{'ANN float32 weights':<40}: {weights:9,} bytes")
+    print(f"{'ANN 1 row, sklearn / numpy':<40}: {sklearn_ms:9.3f} / {flat_ms:.3f} ms ({sklearn_ms / flat_ms:.0f}x)")
+    print(f"{'ANN batch, sklearn / numpy':<40}: {len(X) / sklearn_batch:9,.0f} / {len(X) / flat_batch:,.0f} rows/s")
+    print(f"{'max |proba diff| / label flips':<40}: {diff:9.2e} / {flips} of {len(X)}")
+    once = picklesReadOnce("ANN")
+    print(f"{'ANN pickles read once':<40}: {once}")
+    return diff <= tol and flips == 0 and once
+
+def benchSchema(repeats=20):
+    import numpy as np
+    import preprocess as pp
+
+    def timed(fn):
+        t = time.perf_counter()
+        for _ in range(repeats):
+            out = fn()
+        return out, (time.perf_counter() - t) / repeats * 1000
+
+    inferred, read_ms = timed(lambda: pp.readDataset(typed=False))
+    typed, typed_ms = timed(lambda: pp.readDataset())
+    _, checked_ms = timed(lambda: pp.readDataset(validate=True))
+    #best of, for the comparison below
+    read_best, typed_best = bestMs(lambda: pp.readDataset(typed=False), repeats), bestMs(lambda: pp.readDataset(), repeats)
+    feat_inferred, feat_ms = timed(lambda: pp.buildFeatures(inferred))
+    feat_typed, feat_typed_ms = timed(lambda: pp.buildFeatures(typed))
+
+    before = inferred.memory_usage(deep=True).sum()
+    after = typed.memory_usage(deep=True).sum()
+    same = np.array_equal(feat_inferred.astype(float).to_numpy(), feat_typed.astype(float).to_numpy(), equal_nan=True)
+    print(f"{'dataset in memory, inferred / typed':<40}: {before:9,} / {after:,} bytes ({before / after:.1f}x)")
+    print(f"{'read csv, inferred / typed / +checked':<40}: {read_ms:9.2f} / {typed_ms:.2f} / {checked_ms:.2f} ms")
+    print(f"{'buildFeatures, inferred / typed':<40}: {feat_ms:9.2f} / {feat_typed_ms:.2f} ms")
+    print(f"{'features identical':<40}: {same}")
+    #the default (typed, unchecked) read may cost at most half again the plain one
+    print(f"{'typed read overhead (best of)':<40}: {(typed_best / read_best - 1) * 100:9.0f} %")
+    return same and after < before and typed_best <= 1.5 * read_best
+
+def benchDataset(repeats=20):
+    import os
+    import shutil
+    import tempfile
+    import preprocess as pp
+    import dataset
+
+    def timed(fn):
+        t = time.perf_counter()
+        for _ in range(repeats):
+            out = fn()
+        return out, (time.perf_counter() - t) / repeats * 1000
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "cache")
+        path = os.path.join(tmp, "students.csv")
+        shutil.copy(pp.DATASET_PATH, path)
+
+        raw, parse_ms = timed(lambda: pp.readDataset(path))
+        derive = {
+            "raw": lambda: raw,
+            "features": lambda: pp.buildFeatures(pp.splitDataset(raw)[1]),
+            "ann": lambda: pp.annFitPreProc(pp.splitDataset(raw)[1])[0],
+        }
+        for name in dataset.FRAMES:
+            expected, derive_ms = timed(derive[name])
+            derive_ms += parse_ms
+            t = time.perf_counter()
+            dataset.loadFrame(name, path, cache_dir)
+            first_ms = (time.perf_counter() - t) * 1000
+            cached, cached_ms = timed(lambda: dataset.loadFrame(name, path, cache_dir))
+            same = cached.equals(expected)
+            print(f"{name + ' csv / first / cached':<40}: {derive_ms:9.2f} / {first_ms:.2f} / {cached_ms:.2f} ms ({derive_ms / cached_ms:.0f}x), identical: {same}")
+            ok = ok and same
+
+        #a changed CSV gets a new key and fresh frames
+        old_key = dataset.cacheKey(path)
+        with open(path, "a") as f:
+            f.write(open(pp.DATASET_PATH).read().splitlines()[1] + "\n")
+        refreshed = dataset.loadFrame("raw", path, cache_dir)
+        stale = dataset.staleEntries([path], cache_dir)
+        refreshed_ok = len(refreshed) == len(raw) + 1 and dataset.cacheKey(path) != old_key and len(stale) == 1
+        print(f"{'refreshed after CSV change':<40}: {refreshed_ok} ({len(raw)} -> {len(refreshed)} rows, 1 stale entry)")
+    return ok and refreshed_ok
+
+def benchFeatures(repeats=5, scale=20):
+    import tempfile
+    import pandas as pd
+    import preprocess as pp
+    import featurestore as fs
+
+    #the notebook's three frames, from scratch and through the store
+    df = pd.concat([pp.DF] * scale, ignore_index=True)
+
+    def notebook(rf, hgb, ann):
+        return rf(df), hgb(df), ann(df)[0]
+
+    def timed(fn):
+        t = time.perf_counter()
+        for _ in range(repeats):
+            out = fn()
+        return out, (time.perf_counter() - t) / repeats * 1000
+
+    expected, plain_ms = timed(lambda: notebook(pp.rfPreProc, pp.hgbPreProc, pp.annFitPreProc))
+    with tempfile.TemporaryDirectory() as tmp:
+        def stored(store):
+            return notebook(lambda d: fs.rfPreProc(d, store), lambda d: fs.hgbPreProc(d, store), lambda d: fs.annFitPreProc(d, store))
+
+        #one fresh store per run: the RF frame computes, HGB and ANN reuse its columns
+        _, shared_ms = timed(lambda: stored(fs.FeatureStore(cache_dir=None)))
+        store = fs.FeatureStore(tmp)
+        stored(store)
+        got, rerun_ms = timed(lambda: stored(store))
+        _, disk_ms = timed(lambda: stored(fs.FeatureStore(tmp)))
+        same = all(a.equals(b) for a, b in zip(expected, got))
+
+        #editing one definition recomputes it and the features that read it, in
+        #the running store too; restoring it reads the old columns back
+        def misses(build):
+            before = store.misses
+            build(df)
+            return store.misses - before
+
+        original = pp.FEATURES["approvedRate1stSem"]
+        pp.FEATURES["approvedRate1stSem"] = lambda c: pp.safeRatio(c["curricularUnits1stSemApproved"], c["curricularUnits1stSemEnrolled"])
+        edited = misses(store.build)
+        pp.FEATURES["approvedRate1stSem"] = original
+        restored = misses(store.build)
+        stale = fs.staleEntries([fs.sourceKey(df)], tmp)
+        others = fs.staleEntries([], tmp)
+
+    print(f"{f'rf+hgb+ann frames, {len(df):,} rows':<40}: {plain_ms:9.2f} ms")
+    print(f"{'store, columns shared within the run':<40}: {shared_ms:9.2f} ms ({plain_ms / shared_ms:.2f}x)")
+    print(f"{'store, re-run (memory)':<40}: {rerun_ms:9.2f} ms ({plain_ms / rerun_ms:.2f}x)")
+    print(f"{'store, new process (disk)':<40}: {disk_ms:9.2f} ms ({plain_ms / disk_ms:.2f}x)")
+    print(f"{'identical':<40}: {same}")
+    print(f"{'recomputed after editing / restoring 1':<40}: {edited} / {restored} of {len(pp.FEATURES)}")
+    print(f"{'stale columns / other sources':<40}: {len(stale)} / {len(others)}")
+    return same and edited == 2 and restored == 0 and len(stale) == 2 and len(others) == 1
+#--------------------------------------------------
+
+BENCHES = {
+    "import": benchImport,
+    "startup": benchStartup,
+    "year": benchYear,
+    "server": benchServer,
+    "score": benchScore,
+    "ensemble": benchEnsemble,
+    "cache": benchCache,
+    "importance": benchImportance,
+    "bundle": benchBundle,
+    "trees": benchTrees,
+    "mlp": benchMlp,
+    "schema": benchSchema,
+    "dataset": benchDataset,
+    "features": benchFeatures,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro benchmarks for the prediction code.")
+    parser.add_argument("bench", nargs="*", help=f"benchmarks to run, any of {list(BENCHES)} (default: all)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.bench if name not in BENCHES]
+    if unknown:
+        parser.error(f"unknown benchmark(s) {unknown}, expected any of {list(BENCHES)}")
+
+    results = [BENCHES[name]() for name in args.bench or BENCHES]
+    sys.exit(0 if all(r is not False for r in results) else 1)
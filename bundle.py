@@ -0,0 +1,175 @@
+# bundle.py
+# One artifact per model instead of three or four pickles. The payload holds
+# the estimator, its imputer, the column order and the ANN scaler arrays as a
+# pickle (protocol 5) whose numpy buffers are written out of band, aligned,
+# after it. A load maps the file once and unpickles over it: arrays are views
+# of the mapping (worker processes share the same pages) instead of one read
+# per array, which is what made joblib's mmap_mode slow on the RF's 1,200
+# arrays. The model's NumPy scoring engine (trees.py / mlp.py) is not stored,
+# it would be a second copy of every node or weight; it is rebuilt from the
+# estimator at load. A JSON manifest next to it records the schema version,
+# the buffer layout and the payload's sha256, all checked before anything is
+# unpickled.
+#
+#   python bundle.py            # pack the existing models/*.pkl into bundles
+#
+#   models/model_hgb.bundle       payload (pickle, then the aligned array buffers)
+#   models/model_hgb.bundle.json  manifest
+
+
+#import
+#--------------------------------------------------
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import pickle
+
+import joblib
+import preprocess as pp
+import trees
+import mlp
+from registry import fileHash
+#--------------------------------------------------
+
+#format
+#--------------------------------------------------
+BUNDLE_SCHEMA = 2
+#schema 1: the same payload plus the flat engine, written with joblib.dump
+LEGACY_SCHEMAS = {1}
+BUFFER_ALIGN = 64
+
+BUNDLE_FILES = {
+    "RandomForest": "models/model_rf.bundle",
+    "ANN": "models/model_ann.bundle",
+    "HistGradientBoosting": "models/model_hgb.bundle",
+}
+
+#NumPy scoring engine built from each estimator at load (trees.py, mlp.py)
+FLAT_MODELS = {
+    "RandomForest": trees.FlatForest,
+    "ANN": mlp.FlatMLP,
+    "HistGradientBoosting": trees.FlatForest,
+}
+
+class BundleError(ValueError):
+    pass
+
+def manifestPath(path):
+    return f"{path}.json"
+
+def bundlePayload(model_name, artifacts):
+    #artifacts as returned by inference.loadArtifacts or train.py's pipelines
+    scaler = artifacts.get("scalers")
+    columns = artifacts["columns"]
+    return {
+        "model": model_name,
+        "estimator": artifacts["model"],
+        "imputer": artifacts.get("imputer"),
+        "columns": list(getattr(columns, "columns", columns)),
+        "scaler": pp.AnnScaler.fromArtifact(scaler).toArtifact() if scaler is not None else None,
+    }
+#--------------------------------------------------
+
+#write
+#--------------------------------------------------
+def writeBundle(model_name, artifacts, path, manifest_path=None):
+    manifest_path = manifestPath(path) if manifest_path is None else manifest_path
+    payload = bundlePayload(model_name, artifacts)
+    buffers = []
+    header = pickle.dumps(payload, protocol=5, buffer_callback=buffers.append)
+    layout = []
+    with open(path, "wb") as f:
+        f.write(header)
+        for buffer in buffers:
+            raw = buffer.raw()
+            offset = -(-f.tell() // BUFFER_ALIGN) * BUFFER_ALIGN
+            f.write(bytes(offset - f.tell()))
+            f.write(raw)
+            layout.append([offset, raw.nbytes])
+
+    import sklearn
+    manifest = {
+        "schema": BUNDLE_SCHEMA,
+        "model": model_name,
+        "sha256": fileHash(path),
+        "bytes": os.path.getsize(path),
+        "pickle": len(header),
+        "buffers": layout,
+        "columns": len(payload["columns"]),
+        "sklearn": sklearn.__version__,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def saveBundle(model_name, artifacts, path=None):
+    #payload first, manifest last; a reader caught in between fails the hash check instead of loading
+    path = BUNDLE_FILES[model_name] if path is None else path
+    tmp = f"{path}.tmp-{os.getpid()}"
+    manifest = writeBundle(model_name, artifacts, tmp, manifestPath(tmp))
+    os.replace(tmp, path)
+    os.replace(manifestPath(tmp), manifestPath(path))
+    return manifest
+#--------------------------------------------------
+
+#read
+#--------------------------------------------------
+def readManifest(path):
+    try:
+        with open(manifestPath(path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise BundleError(f"{path}: manifest {manifestPath(path)} is missing")
+
+def loadBundle(path, verify=True, mmap_mode="r"):
+    #mmap_mode=None reads the file into memory instead (writable arrays)
+    manifest = readManifest(path)
+    if manifest.get("schema") in LEGACY_SCHEMAS:
+        if verify and fileHash(path) != manifest["sha256"]:
+            raise BundleError(f"{path}: content hash does not match its manifest")
+        payload = joblib.load(path, mmap_mode=mmap_mode)
+    elif manifest.get("schema") == BUNDLE_SCHEMA:
+        with open(path, "rb") as f:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if mmap_mode else bytearray(f.read()))
+        if verify and hashlib.sha256(data).hexdigest() != manifest["sha256"]:
+            raise BundleError(f"{path}: content hash does not match its manifest")
+        payload = pickle.loads(data[:manifest["pickle"]], buffers=[data[offset:offset + size] for offset, size in manifest["buffers"]])
+    else:
+        raise BundleError(f"{path}: bundle schema {manifest.get('schema')} is not supported (expected {BUNDLE_SCHEMA})")
+
+    if payload["model"] != manifest["model"]:
+        raise BundleError(f"{path}: holds {payload['model']!r}, manifest says {manifest['model']!r}")
+    return payload
+
+def bundleArtifacts(payload):
+    #same dict as inference.loadArtifacts builds from the separate pickles
+    #the "flat" entry of schema 1 bundles is ignored
+    artifacts = {"model": payload["estimator"]}
+    if payload["model"] in FLAT_MODELS:
+        artifacts["flat"] = FLAT_MODELS[payload["model"]].fromModel(payload["estimator"])
+    if payload["scaler"] is not None:
+        artifacts["scalers"] = pp.AnnScaler.fromArtifact(payload["scaler"])
+        artifacts["columns"] = pp.AnnEncoder(payload["columns"])
+    else:
+        artifacts["imputer"] = payload["imputer"]
+        artifacts["columns"] = payload["columns"]
+    return artifacts
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    import inference
+
+    parser = argparse.ArgumentParser(description="Pack the per-model pickles in models/ into bundles.")
+    parser.add_argument("models", nargs="*", help=f"any of {inference.MODEL_NAMES} (default: all available)")
+    args = parser.parse_args()
+
+    for model_name in args.models or inference.MODEL_NAMES:
+        try:
+            artifacts = inference.loadPickles(model_name)
+        except FileNotFoundError as e:
+            print(f"⚠️ {model_name} skipped: {e}")
+            continue
+        manifest = saveBundle(model_name, artifacts)
+        print(f"{model_name:<25}: {BUNDLE_FILES[model_name]} ({manifest['bytes']:,} bytes, sha256 {manifest['sha256'][:12]})")
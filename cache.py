@@ -0,0 +1,163 @@
+# cache.py
+# Prediction results keyed by model, artifact version and the student record.
+# Advisors resubmit the same form and nightly reruns rescore unchanged
+# students, so each row is scored once until its model file changes or the
+# entry expires.
+#
+#   pred, proba = PREDICTIONS.predict("ANN", df, inference.predictBatch)
+
+
+#import
+#--------------------------------------------------
+import collections
+import hashlib
+import json
+import threading
+import time
+
+import joblib
+import numpy as np
+import preprocess as pp
+import inference
+#--------------------------------------------------
+
+#keys
+#--------------------------------------------------
+def canonicalFrame(df):
+    #raw dataset headers and camelCase names give the same key, the target is
+    #not an input, and 1 / 1.0 / np.int64(1) are the same answer
+    df = df.rename(columns=pp.conversion_dict).drop(columns="target", errors="ignore")
+    columns = sorted(df.columns)
+    try:
+        values = df[columns].to_numpy(dtype=np.float64)
+    except (TypeError, ValueError):
+        values = np.array([[json.dumps(v, default=str) for v in row] for row in df[columns].itertuples(index=False)])
+        return columns, values
+    values = values + 0.0 #-0.0 -> 0.0
+    values[np.isnan(values)] = np.nan #one NaN bit pattern
+    return columns, values
+
+def frameKeys(model_name, version, df, kind="row"):
+    columns, values = canonicalFrame(df)
+    prefix = hashlib.sha1(json.dumps([kind, model_name, version, columns], default=str).encode())
+    keys = []
+    for row in values:
+        h = prefix.copy()
+        h.update(row.tobytes() if row.dtype == np.float64 else "\0".join(row).encode())
+        keys.append(h.hexdigest())
+    return keys
+#--------------------------------------------------
+
+#cache
+#--------------------------------------------------
+class PredictionCache:
+    def __init__(self, max_entries=10_000, ttl_seconds=24 * 3600, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._versions = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _checkVersion(self, model_name):
+        #a replaced model file drops its entries right away instead of waiting for LRU/TTL
+        version = inference.artifactVersion(model_name)
+        with self._lock:
+            previous = self._versions.get(model_name)
+            if previous is not None and previous != version:
+                stale = [key for key, (name, _, _) in self._entries.items() if name == model_name]
+                for key in stale:
+                    del self._entries[key]
+                self._stats["invalidations"] += len(stale)
+            self._versions[model_name] = version
+        return version
+
+    def keys(self, model_name, df, kind="row"):
+        return frameKeys(model_name, self._checkVersion(model_name), df, kind)
+
+    def get(self, key):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[2]
+
+    def put(self, key, model_name, value):
+        with self._lock:
+            self._entries[key] = (model_name, self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def getOrCompute(self, model_name, stud, compute, kind="row"):
+        key = self.keys(model_name, stud, kind)[0]
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, model_name, value)
+        return value
+
+    #predict is split in two so the async server can await the scoring in between
+    def split(self, model_name, df):
+        keys = self.keys(model_name, df)
+        values = [self.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        return keys, values, missing
+
+    def fill(self, model_name, keys, values, missing, pred=None, proba=None):
+        for j, i in enumerate(missing):
+            #a copy, so a cached row doesn't keep its whole batch's array alive
+            values[i] = (pred[j], proba[j].copy())
+            self.put(keys[i], model_name, values[i])
+        return np.array([v[0] for v in values]), np.vstack([v[1] for v in values])
+
+    def predict(self, model_name, df, score=inference.predictBatch):
+        keys, values, missing = self.split(model_name, df)
+        if not missing:
+            return self.fill(model_name, keys, values, missing)
+        pred, proba = score(model_name, df.iloc[missing])
+        return self.fill(model_name, keys, values, missing, pred, proba)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    #persisted between runs so a nightly rescore only scores new or changed students
+    def save(self, path):
+        now = self._clock()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._entries.items() if entry[1] > now]
+            versions = dict(self._versions)
+        joblib.dump({"entries": entries, "versions": versions}, path)
+
+    def load(self, path):
+        state = joblib.load(path)
+        with self._lock:
+            self._entries.update(state["entries"])
+            self._versions.update(state["versions"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return self
+
+
+PREDICTIONS = PredictionCache()
+#--------------------------------------------------
@@ -0,0 +1,255 @@
+# dataset.py
+# Columnar cache of the student dataset. The typed raw CSV, the shared
+# feature frame and the scaled ANN frame are written once per source file as
+# column-major .npy blocks (one per dtype) plus a JSON manifest, in a
+# directory named after the CSV's sha256 and definitionsHash (the schema,
+# the feature versions and preprocess.py's code, so a changed feature
+# definition also rebuilds but an edited comment doesn't). Loads memory-map
+# the blocks and hand their rows to a DataFrame without copying; when the
+# CSV changes its hash changes and the frames are derived again.
+#
+#   python dataset.py                    # materialize db/'s CSV
+#   feat = loadFrame("features")         # = pp.buildFeatures(pp.DF)
+#
+#   <repo>/.cache/dataset/<key>/raw/manifest.json, block0.npy, block1.npy, ...
+
+
+#import
+#--------------------------------------------------
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import preprocess as pp
+import featurestore
+from registry import fileHash
+#--------------------------------------------------
+
+#frames
+#--------------------------------------------------
+#next to the code rather than in the working directory, so pp.DF from app.py
+#or a notebook elsewhere uses (and only ever writes) the repo's cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "dataset")
+FRAME_FORMAT = 1
+
+def annFrame(raw):
+    df_ann, scaler = featurestore.annFitPreProc(pp.splitDataset(raw)[1])
+    artifact = scaler.toArtifact()
+    return df_ann, {"scaler": {"columns": artifact["columns"], "dataMin": artifact["dataMin"].tolist(), "dataMax": artifact["dataMax"].tolist()}}
+
+#each builder gets the typed raw frame and returns (frame, json-able meta).
+#rfFromFeatures/hgbFromFeatures return the feature frame as is, so the RF and
+#HGB frames are served from "features" instead of being stored twice.
+FRAMES = {
+    "raw": lambda raw: (raw, {}),
+    "features": lambda raw: (featurestore.STORE.build(pp.splitDataset(raw)[1]), {}),
+    "ann": annFrame,
+}
+
+@functools.lru_cache(maxsize=64)
+def _signedHash(path, signature):
+    return fileHash(path)
+
+def sourceHash(path):
+    #rehashed only when the file's mtime or size moves
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _signedHash(path, (stat.st_mtime_ns, stat.st_size))
+
+def codeHash(h, fn):
+    #bytecode and constants only, so comments, blank lines and moved code don't count
+    for code in featurestore.codeObjects(fn.__code__):
+        h.update(code.co_code)
+        h.update(repr([const for const in code.co_consts if not isinstance(const, types.CodeType)]).encode())
+
+@functools.lru_cache(maxsize=8)
+def _definitionsHash(feature_versions):
+    h = hashlib.sha256(repr(pp.DATASET_SCHEMA).encode())
+    h.update(repr(feature_versions).encode())
+    h.update(repr([pp.conversion_dict, pp.targetMap, pp.REPLACED_COLUMNS, pp.ANN_COLUMNS]).encode())
+    #the steps around the features: reading and typing the CSV, the split, the ANN encoding and scaling
+    for value in vars(pp).values():
+        members = vars(value).values() if isinstance(value, type) else [value]
+        for fn in (getattr(member, "__func__", member) for member in members):
+            if isinstance(fn, types.FunctionType) and fn.__module__ == pp.__name__:
+                codeHash(h, fn)
+    return h.hexdigest()
+
+def definitionsHash():
+    #what the frames are derived with: DATASET_SCHEMA, the feature versions
+    #featurestore.py computes and the code of preprocess.py, but not its
+    #comments or layout
+    return _definitionsHash(tuple(featurestore.featureVersion(name) for name in pp.FEATURES))
+
+def cacheKey(path):
+    return hashlib.sha256(f"{FRAME_FORMAT}:{sourceHash(path)}:{definitionsHash()}".encode()).hexdigest()[:20]
+
+def frameDir(name, path=pp.DATASET_PATH, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, cacheKey(path), name)
+#--------------------------------------------------
+
+#write
+#--------------------------------------------------
+#columns are stored by dtype: every column of one dtype is a row of a single
+#(columns, rows) block, so a frame is a handful of files and each column is a
+#contiguous, memory-mapped slice of its block
+def columnParts(values):
+    #(numpy arrays to store, manifest entry) for one column
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return [values.cat.codes.to_numpy()], {"kind": "category", "categories": values.cat.categories.tolist(), "ordered": bool(values.dtype.ordered)}
+    if isinstance(values.array, pd.arrays.IntegerArray):
+        #nullable ints (targetInt): values and mask side by side
+        return [values.fillna(0).to_numpy(dtype=values.dtype.numpy_dtype), values.isna().to_numpy()], {"kind": "masked"}
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biuf":
+        return [values.to_numpy()], {"kind": "numpy"}
+    raise ValueError(f"{values.name}: {values.dtype} columns are not supported by the columnar cache")
+
+def writeFrame(df, directory, meta=None, source=None):
+    #columns land in a temporary directory that is renamed into place, so a
+    #reader sees the whole frame or none of it
+    blocks, columns = {}, []
+    for name in df.columns:
+        arrays, column = columnParts(df[name])
+        column["slots"] = []
+        for array in arrays:
+            block = blocks.setdefault(array.dtype.str, [])
+            column["slots"].append([array.dtype.str, len(block)])
+            block.append(array)
+        columns.append({"name": name, **column})
+    block_files = {dtype: f"block{i}.npy" for i, dtype in enumerate(blocks)}
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for dtype, arrays in blocks.items():
+        np.save(os.path.join(tmp, block_files[dtype]), np.stack(arrays))
+
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index_info = {"kind": "range", "start": index.start, "stop": index.stop, "step": index.step}
+    else:
+        np.save(os.path.join(tmp, "index.npy"), index.to_numpy())
+        index_info = {"kind": "numpy"}
+
+    manifest = {"format": FRAME_FORMAT, "source": source, "rows": len(df), "index": index_info, "blocks": block_files, "columns": columns, "meta": meta or {}}
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    try:
+        os.replace(tmp, directory)
+    except OSError:
+        #another process materialized the same frame first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return manifest
+#--------------------------------------------------
+
+#read
+#--------------------------------------------------
+def readColumn(column, blocks):
+    values, *mask = [blocks[dtype][slot] for dtype, slot in column["slots"]]
+    if column["kind"] == "category":
+        return pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(column["categories"], column["ordered"]))
+    if column["kind"] == "masked":
+        return pd.arrays.IntegerArray(np.asarray(values), np.asarray(mask[0]))
+    return values
+
+def readFrame(directory, mmap_mode="r"):
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest["format"] != FRAME_FORMAT:
+        raise ValueError(f"{directory}: frame format {manifest['format']} is not supported (expected {FRAME_FORMAT})")
+
+    index = manifest["index"]
+    if index["kind"] == "range":
+        index = pd.RangeIndex(index["start"], index["stop"], index["step"])
+    else:
+        index = pd.Index(np.load(os.path.join(directory, "index.npy"), mmap_mode=mmap_mode))
+
+    #copy=False keeps the memory-mapped columns as they are
+    blocks = {dtype: np.load(os.path.join(directory, file), mmap_mode=mmap_mode) for dtype, file in manifest["blocks"].items()}
+    data = {column["name"]: readColumn(column, blocks) for column in manifest["columns"]}
+    return pd.DataFrame(data, index=index, copy=False), manifest
+
+def writable(directory):
+    #the nearest existing directory decides whether the cache can be created
+    while not os.path.isdir(directory) and os.path.dirname(directory) != directory:
+        directory = os.path.dirname(directory)
+    return os.access(directory, os.W_OK)
+
+def loadEntry(name, path=pp.DATASET_PATH, cache_dir=CACHE_DIR, mmap_mode="r"):
+    directory = frameDir(name, path, cache_dir)
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        return readFrame(directory, mmap_mode)
+
+    raw = pp.readDataset(path) if name == "raw" else loadFrame("raw", path, cache_dir, mmap_mode)
+    df, meta = FRAMES[name](raw)
+    if not writable(directory):
+        #read-only deployment: derive the frame every time, quietly
+        return df, {"meta": meta}
+    try:
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        manifest = writeFrame(df, directory, meta, source=os.path.abspath(path))
+    except (OSError, ValueError) as e:
+        #full disk, or a column kept as read (e.g. text labels outside
+        #targetMap): serve the derived frame uncached
+        print(f"⚠️ {name} frame not cached: {e}")
+        manifest = {"meta": meta}
+    return df, manifest
+
+def loadFrame(name, path=pp.DATASET_PATH, cache_dir=CACHE_DIR, mmap_mode="r"):
+    return loadEntry(name, path, cache_dir, mmap_mode)[0]
+
+def features(df=None):
+    #pp.buildFeatures(df): the cached frame for the default dataset (pp.DF),
+    #featurestore.py's memoized columns for any other
+    return loadFrame("features") if df is None else featurestore.STORE.build(df)
+
+def loadAnnFrame(path=pp.DATASET_PATH, cache_dir=CACHE_DIR, mmap_mode="r"):
+    #same pair as pp.annFitPreProc(pp.DF)
+    df_ann, manifest = loadEntry("ann", path, cache_dir, mmap_mode)
+    scaler = manifest["meta"]["scaler"]
+    return df_ann, pp.AnnScaler(scaler["columns"], scaler["dataMin"], scaler["dataMax"])
+
+def staleEntries(paths, cache_dir=CACHE_DIR):
+    #cache directories built from anything other than the current paths and preprocess.py
+    current = {cacheKey(path) for path in paths}
+    if not os.path.isdir(cache_dir):
+        return []
+    return [os.path.join(cache_dir, key) for key in sorted(os.listdir(cache_dir)) if key not in current]
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize the dataset's raw and preprocessed frames into the columnar cache.")
+    parser.add_argument("paths", nargs="*", default=[pp.DATASET_PATH], help=f"semicolon CSVs (default: {pp.DATASET_PATH})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--features-dir", default=featurestore.CACHE_DIR)
+    parser.add_argument("--validate", action="store_true", help="check every CSV's codes and value ranges against preprocess.DATASET_SCHEMA first")
+    parser.add_argument("--clean", action="store_true", help="remove cache entries of older CSV or preprocess.py versions, and feature columns of older definitions or other sources")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if args.validate:
+            pp.readDataset(path, validate=True)
+        print(f"{path} -> {os.path.join(args.cache_dir, cacheKey(path))}")
+        for name in FRAMES:
+            start = time.perf_counter()
+            df = loadFrame(name, path, args.cache_dir)
+            print(f"  {name:<10}: {len(df):>8,} rows x {df.shape[1]:>3} columns, {time.perf_counter() - start:.3f}s")
+    if args.clean:
+        #feature columns are kept for the CSVs' DF_INIT, DF_USE and DF
+        keep = set()
+        for path in args.paths:
+            raw = loadFrame("raw", path, args.cache_dir)
+            keep.update(featurestore.sourceKey(df) for df in (raw, *pp.splitDataset(raw)))
+        for entry in staleEntries(args.paths, args.cache_dir) + featurestore.staleEntries(keep, args.features_dir):
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            else:
+                os.remove(entry)
+            print(f"removed {entry}")
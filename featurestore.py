@@ -0,0 +1,226 @@
+# featurestore.py
+# Engineered feature columns memoized one by one. Each column of
+# pp.FEATURES is stored under the hash of the raw columns it was computed
+# from and a version of its definition: the fingerprint of its code, of the
+# helpers, code dictionaries and lookup arrays it uses, and of the versions
+# of the features it reads. Re-running a training cell, or building the RF,
+# HGB and ANN frames from the same data, then reads the columns back instead
+# of recomputing them, and editing one feature only recomputes it and the
+# features built on it.
+#
+#   feat = STORE.build(pp.DF)             # = pp.buildFeatures(pp.DF)
+#   df_rf, df_hgb = rfPreProc(pp.DF), hgbPreProc(pp.DF)
+#
+#   <repo>/.cache/features/<source key>/<feature>-<version>.npy
+#   python dataset.py --clean            # drop older versions and other sources
+
+
+#import
+#--------------------------------------------------
+import functools
+import hashlib
+import os
+import threading
+import types
+
+import numpy as np
+import pandas as pd
+import preprocess as pp
+#--------------------------------------------------
+
+#versions
+#--------------------------------------------------
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "features")
+
+def codeObjects(code):
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from codeObjects(const)
+
+def fingerprint(fn, h, seen):
+    #bytecode, constants and every module-level name it reaches (helpers
+    #recursively, dicts and arrays by value)
+    for code in codeObjects(fn.__code__):
+        h.update(code.co_code)
+        h.update(repr([const for const in code.co_consts if not isinstance(const, types.CodeType)]).encode())
+        for name in code.co_names:
+            if name in seen or name not in fn.__globals__:
+                continue
+            seen.add(name)
+            value = fn.__globals__[name]
+            if isinstance(value, types.FunctionType):
+                fingerprint(value, h, seen)
+            elif isinstance(value, np.ndarray):
+                h.update(value.tobytes())
+            elif isinstance(value, (dict, list, tuple, str, int, float)):
+                h.update(repr(value).encode())
+
+def featureInputs(name):
+    #earlier features this one reads, from the c["..."] keys in its code
+    feature = pp.FEATURES[name]
+    keys = {const for code in codeObjects(feature.__code__) for const in code.co_consts if isinstance(const, str)}
+    earlier = list(pp.FEATURES)[:list(pp.FEATURES).index(name)]
+    return [dep for dep in earlier if dep in keys]
+
+def featureVersion(name):
+    #memoized on the function as well as the name, so a feature redefined in
+    #pp.FEATURES (e.g. by re-running a notebook cell) gets a new version
+    feature = pp.FEATURES[name]
+    return _version(feature, tuple(featureVersion(dep) for dep in featureInputs(name)))
+
+@functools.lru_cache(maxsize=None)
+def _version(feature, inputs):
+    h = hashlib.sha1()
+    fingerprint(feature, h, set())
+    for version in inputs:
+        h.update(version.encode())
+    return h.hexdigest()[:12]
+
+def updateHash(h, values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        h.update(repr(values.cat.categories.tolist()).encode())
+        values = values.cat.codes
+    array = values.to_numpy()
+    h.update(f"{values.name}:{array.dtype.str}:{len(array)}".encode())
+    if array.dtype.kind in "biuf":
+        h.update(np.ascontiguousarray(array).tobytes())
+    else:
+        h.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+
+def sourceKey(df):
+    #hash of the raw columns as stored (the int8/int16 columns of the typed
+    #dataset hash 4-8x fewer bytes than int64 ones), target included
+    df = df.rename(columns=pp.conversion_dict)
+    h = hashlib.sha1()
+    for col in sorted(df.columns):
+        updateHash(h, df[col])
+    return h.hexdigest()
+
+def frameKey(df, source_key):
+    #what else shapes buildFeatures' output: column order, index, definitions
+    h = hashlib.sha1(source_key.encode())
+    h.update(repr(list(df.columns)).encode())
+    if isinstance(df.index, pd.RangeIndex):
+        h.update(repr(df.index).encode())
+    else:
+        updateHash(h, df.index.to_series())
+    h.update(repr([featureVersion(name) for name in pp.FEATURES]).encode())
+    return h.hexdigest()
+
+def staleEntries(source_keys=None, cache_dir=CACHE_DIR):
+    #column files of older feature definitions and, given the source keys to
+    #keep, the directories of every other source
+    if not os.path.isdir(cache_dir):
+        return []
+    current = {f"{name}-{featureVersion(name)}.npy" for name in pp.FEATURES}
+    stale = []
+    for key in sorted(os.listdir(cache_dir)):
+        directory = os.path.join(cache_dir, key)
+        if source_keys is not None and key not in source_keys:
+            stale.append(directory)
+        else:
+            stale += [os.path.join(directory, file) for file in sorted(os.listdir(directory)) if file not in current]
+    return stale
+#--------------------------------------------------
+
+#store
+#--------------------------------------------------
+class FeatureStore:
+    def __init__(self, cache_dir=CACHE_DIR, max_sources=8):
+        self.cache_dir = cache_dir
+        self.max_sources = max_sources
+        self._lock = threading.Lock()
+        self._memory = {} #source key -> {feature file name: column}, most recent last
+        self._frames = {} #frame key -> assembled feature frame, most recent last
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+
+    def _remember(self, source_key, file, column):
+        with self._lock:
+            columns = self._memory.pop(source_key, {})
+            columns[file] = column
+            self._memory[source_key] = columns
+            while len(self._memory) > self.max_sources:
+                self._memory.pop(next(iter(self._memory)))
+
+    def column(self, source_key, name, feature, c):
+        #memory first, then disk (cache_dir=None keeps the store in memory only)
+        file = f"{name}-{featureVersion(name)}"
+        with self._lock:
+            column = self._memory.get(source_key, {}).get(file)
+            if column is not None:
+                self.hits += 1
+                return column
+
+        path = None if self.cache_dir is None else os.path.join(self.cache_dir, source_key, f"{file}.npy")
+        if path is not None and os.path.exists(path):
+            self.diskHits += 1
+            column = np.load(path, mmap_mode="r")
+        else:
+            self.misses += 1
+            column = np.asarray(feature(c))
+            if path is not None:
+                tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}.npy"
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    np.save(tmp, column)
+                    os.replace(tmp, path)
+                except OSError:
+                    #read-only checkout or full disk: the column stays in memory only
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+        self._remember(source_key, file, column)
+        return column
+
+    def build(self, df):
+        #same frame as pp.buildFeatures(df). The assembled frame is kept too, and
+        #handed out as a deep copy so changes to it never reach the stored one,
+        #with or without pandas' copy-on-write
+        source_key = sourceKey(df)
+        frame_key = frameKey(df, source_key)
+        with self._lock:
+            feat = self._frames.pop(frame_key, None)
+            if feat is not None:
+                self._frames[frame_key] = feat #most recent last
+        if feat is None:
+            feat = pp.buildFeatures(df, compute=lambda name, feature, c: self.column(source_key, name, feature, c))
+            with self._lock:
+                self._frames[frame_key] = feat
+                while len(self._frames) > self.max_sources:
+                    self._frames.pop(next(iter(self._frames)))
+        else:
+            with self._lock:
+                self.hits += len(pp.FEATURES)
+        return feat.copy()
+
+    def stats(self):
+        return {"hits": self.hits, "diskHits": self.diskHits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._frames.clear()
+
+
+STORE = FeatureStore()
+#--------------------------------------------------
+
+#model frames
+#--------------------------------------------------
+#pp's *PreProc helpers with the features read from the store
+def rfPreProc(df_rf, store=None):
+    return pp.rfFromFeatures((store or STORE).build(df_rf))
+
+def hgbPreProc(df_hgb, store=None):
+    return pp.hgbFromFeatures((store or STORE).build(df_hgb))
+
+def annPreProc(df_ann, scaler, encoder=None, store=None):
+    return pp.annFromFeatures((store or STORE).build(df_ann), scaler, encoder)
+
+def annFitPreProc(df_ann, store=None):
+    df_ann = pp.annEncode((store or STORE).build(df_ann))
+    scaler = pp.AnnScaler().fit(df_ann)
+    return scaler.transform(df_ann), scaler
+#--------------------------------------------------
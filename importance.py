@@ -0,0 +1,159 @@
+# importance.py
+# Permutation importance without sklearn's per-repeat copies. The test matrix
+# is copied once; each column (or group of related columns, shuffled
+# together by row) is permuted in place and restored afterwards. Repeats
+# stop early once the standard error of the mean drop is below tol. Results
+# are cached on disk per model artifact and test set.
+#
+#   python importance.py --groups
+
+
+#import
+#--------------------------------------------------
+import argparse
+import fnmatch
+import os
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+import dataset
+import inference
+from registry import fileSignature
+#--------------------------------------------------
+
+#groups
+#--------------------------------------------------
+CACHE_DIR = ".cache/importance"
+
+#related columns permuted together, matched with fnmatch
+DEFAULT_GROUPS = {
+    "1stSem": ["curricularUnits1stSem*", "*1stSem"],
+    "2ndSem": ["curricularUnits2ndSem*", "*2ndSem"],
+    "parents": ["mother*", "father*", "*Parental*"],
+    "economy": ["unemploymentRate", "inflationRate", "gdp", "economicStressIndex", "isEconomyGood", "year"],
+}
+
+def columnGroups(columns, groups=None):
+    #every column on its own, except the ones a group pattern claims
+    out = {}
+    claimed = set()
+    for name, patterns in (groups or {}).items():
+        members = [col for col in columns if col not in claimed and any(fnmatch.fnmatchcase(col, p) for p in patterns)]
+        if members:
+            out[name] = members
+            claimed.update(members)
+    for col in columns:
+        if col not in claimed:
+            out[col] = [col]
+    return out
+#--------------------------------------------------
+
+#scoring
+#--------------------------------------------------
+def f1Macro(y_true, y_pred, labels):
+    #f1_score(average="macro") from one bincount, over the labels present in either array
+    k = len(labels)
+    t = np.searchsorted(labels, y_true)
+    p = np.searchsorted(labels, y_pred)
+    cm = np.bincount(t * k + p, minlength=k * k).reshape(k, k)
+    tp = np.diag(cm)
+    support, predicted = cm.sum(axis=1), cm.sum(axis=0)
+    present = (support + predicted) > 0
+    denom = support + predicted
+    f1 = np.divide(2 * tp, denom, out=np.zeros(k), where=denom > 0)
+    return f1[present].mean()
+#--------------------------------------------------
+
+#engine
+#--------------------------------------------------
+def permutationImportance(model, X, y, groups=None, n_repeats=10, min_repeats=3, tol=0.0025, random_state=42, predict=None):
+    columns = list(X.columns)
+    work = X.to_numpy(dtype=float, copy=True)
+    y = np.asarray(y, dtype=float)
+    labels = np.union1d(np.asarray(model.classes_, dtype=float), y)
+    predict = model.predict if predict is None else predict
+
+    def score():
+        #the model was fitted on a DataFrame; the matrix keeps its column order
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return f1Macro(y, np.asarray(predict(work), dtype=float), labels)
+
+    baseline = score()
+    rows = []
+    for g, (name, members) in enumerate(columnGroups(columns, groups).items()):
+        idx = [columns.index(col) for col in members]
+        saved = work[:, idx].copy()
+        rng = np.random.default_rng([random_state, g])
+
+        drops = []
+        for r in range(n_repeats):
+            work[:, idx] = saved[rng.permutation(len(work))]
+            drops.append(baseline - score())
+            if r + 1 >= min_repeats and np.std(drops, ddof=1) / np.sqrt(r + 1) <= tol:
+                break
+        work[:, idx] = saved
+
+        drops = np.array(drops)
+        std = drops.std(ddof=1) if len(drops) > 1 else 0.0
+        rows.append({
+            "Feature": name,
+            "Importance": drops.mean(),
+            "Std": std,
+            "StdErr": std / np.sqrt(len(drops)),
+            "Repeats": len(drops),
+            "Columns": len(members),
+        })
+
+    result = pd.DataFrame(rows).sort_values(by="Importance", ascending=False, ignore_index=True)
+    result.attrs["baseline"] = baseline
+    return result
+#--------------------------------------------------
+
+#cache
+#--------------------------------------------------
+def cachedImportance(model, X, y, model_key=None, cache_dir=CACHE_DIR, **options):
+    #model_key identifies the artifact (e.g. its file signature); defaults to hashing the model
+    model_key = joblib.hash(model) if model_key is None else model_key
+    key = joblib.hash([model_key, list(X.columns), X.to_numpy(), np.asarray(y, dtype=float), sorted(options.items(), key=lambda kv: kv[0])])
+    path = os.path.join(cache_dir, f"{key}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    result = permutationImportance(model, X, y, **options)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(result, tmp)
+    os.replace(tmp, path)
+    return result
+
+def artifactImportance(model_name="HistGradientBoosting", df=None, **options):
+    #importance of the saved model on train.py's held-out split, cached per artifact version
+    import train
+
+    artifacts = inference.loadArtifacts(model_name)
+    feat = dataset.features(df)
+    _, test_idx = train.splitIndices(feat["targetInt"])
+    feat_test = feat.iloc[test_idx]
+    X_test = inference.preprocessStudent(model_name, None, artifacts, feat_test.drop(columns="targetInt"))
+    y_test = feat_test["targetInt"]
+
+    model_key = [(path, fileSignature(path)) for path in inference.MODEL_FILES[model_name].values()]
+    return cachedImportance(artifacts["model"], X_test, y_test, model_key=model_key, **options)
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Permutation importance of a saved model on the held-out split.")
+    parser.add_argument("--model", choices=inference.MODEL_NAMES, default="HistGradientBoosting")
+    parser.add_argument("--groups", action="store_true", help=f"permute related columns together: {list(DEFAULT_GROUPS)}")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--tol", type=float, default=0.0025, help="stop repeating once the std-error of the mean drop is below this")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = artifactImportance(args.model, groups=DEFAULT_GROUPS if args.groups else None, n_repeats=args.repeats, tol=args.tol)
+    print(result.to_string())
+    print(f"baseline f1_macro {result.attrs['baseline']:.4f}, {time.perf_counter() - start:.2f}s")
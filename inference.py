@@ -0,0 +1,263 @@
+# inference.py
+# Everything needed to score a student, and nothing that is only needed to
+# train or plot. Keep training imports (metrics, SMOTE, plotting) out of here.
+
+
+#import
+#--------------------------------------------------
+import functools
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import preprocess as pp
+import bundle
+from registry import REGISTRY, fileSignature
+#--------------------------------------------------
+
+#artifacts
+#--------------------------------------------------
+MODEL_NAMES = ["RandomForest", "ANN", "HistGradientBoosting"]
+ENSEMBLE = "Ensemble"
+
+MODEL_FILES = {
+    "RandomForest": {
+        "model": "models/model_rf.pkl",
+        "imputer": "models/model_rf_imputer.pkl",
+        "columns": "models/model_rf_columns.pkl",
+    },
+    "ANN": {
+        "model": "models/model_ann.pkl",
+        "scalers": "models/model_ann_scalers.pkl",
+        "columns": "models/model_ann_columns.pkl",
+    },
+    "HistGradientBoosting": {
+        "model": "models/model_hgb.pkl",
+        "imputer": "models/model_hgb_imputer.pkl",
+        "columns": "models/model_hgb_columns.pkl",
+    },
+}
+
+ARTIFACT_CONVERTERS = {
+    ("ANN", "scalers"): pp.AnnScaler.fromArtifact,
+    ("ANN", "columns"): pp.AnnEncoder,
+}
+
+#batches up to this many rows go to the NumPy engines (bundle.FLAT_MODELS):
+#the flat trees only beat sklearn on small batches, the float32 MLP at any size.
+#bench.py trees measures where sklearn takes over (RF around 64 rows, HGB
+#around 256, where the two tie) and checks the flat engine wins at the limit
+FLAT_MAX_ROWS = {"RandomForest": 16, "ANN": None, "HistGradientBoosting": 128}
+
+def loadPickles(model_name, files=None):
+    #files: {kind: path} in place of MODEL_FILES[model_name], e.g. a train.py --out directory
+    if model_name not in MODEL_FILES:
+        raise ValueError(f"Unknown model {model_name!r}, expected one of {MODEL_NAMES}")
+    files = MODEL_FILES[model_name] if files is None else files
+    artifacts = {kind: REGISTRY.load(path, ARTIFACT_CONVERTERS.get((model_name, kind))) for kind, path in files.items()}
+    if model_name in bundle.FLAT_MODELS:
+        #built from the model object the registry already unpickled above
+        artifacts["flat"] = REGISTRY.load(files["model"], bundle.FLAT_MODELS[model_name].fromModel)
+    return artifacts
+
+#train.py describes each set it moves into models/ here, with the signature
+#every file had before and will have after, and marks it complete once all of
+#them are in place
+COMMIT_FILE = "models/commit.json"
+
+class IncompleteCommitError(RuntimeError):
+    pass
+
+@functools.lru_cache(maxsize=4)
+def _readCommit(path, signature):
+    with open(path) as f:
+        return json.load(f)
+
+def signatureOrNone(path):
+    try:
+        return list(fileSignature(path))
+    except FileNotFoundError:
+        return None
+
+def commitState(path=COMMIT_FILE):
+    #"new" once the last commit finished, "old" if none of its files has moved
+    #yet, "mixed" while it is moving them or after it was killed halfway
+    try:
+        commit = _readCommit(path, fileSignature(path))
+    except FileNotFoundError:
+        return None
+    if commit["complete"]:
+        return "new"
+    current = {name: signatureOrNone(os.path.join(os.path.dirname(path), name)) for name in commit["files"]}
+    for state in ("old", "new"):
+        if all(current[name] == files[state] for name, files in commit["files"].items()):
+            return state
+    return "mixed"
+
+def loadArtifacts(model_name):
+    if commitState() == "mixed":
+        raise IncompleteCommitError(f"{COMMIT_FILE}: a training run is being moved into models/, or was killed halfway (then run train.py again)")
+    #a bundle (bundle.py) wins over the separate pickles, unless a pickle was
+    #written after it (e.g. the notebook retrained the model)
+    path = bundle.BUNDLE_FILES.get(model_name)
+    if path is not None and os.path.exists(path):
+        bundle_mtime = os.path.getmtime(path)
+        if all(os.path.getmtime(p) <= bundle_mtime for p in MODEL_FILES[model_name].values() if os.path.exists(p)):
+            return REGISTRY.load(path, bundle.bundleArtifacts, bundle.loadBundle)
+    return loadPickles(model_name)
+
+def artifactVersion(model_name):
+    #changes whenever one of the model's files is replaced; a missing file counts as None
+    names = MODEL_NAMES if model_name == ENSEMBLE else [model_name]
+    version = []
+    for name in names:
+        for path in [bundle.BUNDLE_FILES[name], *MODEL_FILES[name].values()]:
+            try:
+                version.append((path, REGISTRY.version(path)))
+            except FileNotFoundError:
+                version.append((path, None))
+    if model_name == ENSEMBLE:
+        version.append(("weights", sorted(ENSEMBLE_WEIGHTS.items())))
+    return tuple(version)
+#--------------------------------------------------
+
+#preprocess
+#--------------------------------------------------
+def preprocessStudent(model_name, stud, artifacts, feat=None):
+    #feat lets several models share one pp.buildFeatures pass over the same batch
+    if feat is None:
+        feat = pp.buildFeatures(stud)
+
+    if model_name == "RandomForest":
+        stud = pp.rfFromFeatures(feat)
+        stud = stud.reindex(columns=artifacts["columns"], fill_value=0)
+        return pd.DataFrame(artifacts["imputer"].transform(stud), columns=artifacts["columns"])
+
+    if model_name == "ANN":
+        encoder = artifacts["columns"]
+        return pd.DataFrame(encoder.transform(feat, artifacts["scalers"]), columns=encoder.columns).fillna(0)
+
+    if model_name == "HistGradientBoosting":
+        stud = pp.hgbFromFeatures(feat)
+        stud = stud.reindex(columns=artifacts["columns"], fill_value=0)
+        return pd.DataFrame(artifacts["imputer"].transform(stud), columns=artifacts["columns"])
+
+    raise ValueError(f"Unknown model {model_name!r}, expected one of {MODEL_NAMES}")
+#--------------------------------------------------
+
+#predict
+#--------------------------------------------------
+def scoreModel(model, X):
+    #one predict_proba pass; the label is its argmax, exactly what predict() returns
+    proba = model.predict_proba(X)
+    return model.classes_[proba.argmax(axis=1)], proba
+
+def scoreArtifacts(model_name, artifacts, X):
+    flat = artifacts.get("flat")
+    limit = FLAT_MAX_ROWS.get(model_name, 0)
+    if flat is not None and (limit is None or len(X) <= limit):
+        return scoreModel(flat, X.to_numpy())
+    return scoreModel(artifacts["model"], X)
+
+def predictBatch(model_name, df):
+    if model_name == ENSEMBLE:
+        pred, proba, _ = predictEnsemble(df)
+        return pred, proba
+    artifacts = loadArtifacts(model_name)
+    X = preprocessStudent(model_name, df, artifacts)
+    return scoreArtifacts(model_name, artifacts, X)
+
+def predictStudent(model_name, stud):
+    pred, proba = predictBatch(model_name, stud)
+    return pred[0], proba[0]
+#--------------------------------------------------
+
+#ensemble
+#--------------------------------------------------
+#relative weight of each model in the averaged probabilities
+ENSEMBLE_WEIGHTS = {"RandomForest": 1.0, "ANN": 1.0, "HistGradientBoosting": 1.0}
+CLASSES = np.array(sorted(pp.targetMapReverse))
+
+#sklearn's predict_proba releases the GIL, so big batches overlap the models on
+#threads. Small ones are GIL-bound Python and NumPy work that threads can't
+#overlap, so they run in turn on the caller thread; their cost is kept low by
+#sharing one float feature matrix and the RF/HGB reindex + impute.
+_ensemble_pool = ThreadPoolExecutor(max_workers=len(MODEL_NAMES), thread_name_prefix="ensemble")
+ENSEMBLE_THREAD_ROWS = 256
+
+def sharedFeatures(feat):
+    return {"matrix": feat.to_numpy(dtype=float, na_value=np.nan), "position": {col: i for i, col in enumerate(feat.columns)}, "imputed": {}}
+
+def imputedMatrix(artifacts, shared):
+    #preprocessStudent's reindex(fill_value=0) + SimpleImputer(mean).transform on
+    #the shared matrix; RF and HGB with the same columns and means share the result
+    columns, imputer = artifacts["columns"], artifacts["imputer"]
+    key = (tuple(columns), imputer.statistics_.tobytes())
+    if key not in shared["imputed"]:
+        position = shared["position"]
+        X = np.zeros((len(shared["matrix"]), len(columns)))
+        present = [(j, position[col]) for j, col in enumerate(columns) if col in position]
+        X[:, [j for j, _ in present]] = shared["matrix"][:, [i for _, i in present]]
+        missing = np.isnan(X)
+        X[missing] = imputer.statistics_[np.nonzero(missing)[1]]
+        shared["imputed"][key] = pd.DataFrame(X, columns=columns)
+    return shared["imputed"][key]
+
+def canShare(model_name, artifacts):
+    if model_name == "ANN":
+        return True
+    imputer = artifacts.get("imputer")
+    return (type(imputer).__name__ == "SimpleImputer" and imputer.strategy == "mean" and not imputer.add_indicator
+            and np.isnan(imputer.missing_values) and not np.isnan(imputer.statistics_).any())
+
+def scoreFromFeatures(model_name, df, feat, artifacts, shared=None):
+    if shared is None or not canShare(model_name, artifacts):
+        X = preprocessStudent(model_name, df, artifacts, feat)
+    elif model_name == "ANN":
+        encoder = artifacts["columns"]
+        X = pd.DataFrame(encoder.transformMatrix(shared["matrix"], shared["position"], artifacts["scalers"]), columns=encoder.columns).fillna(0)
+    else:
+        X = imputedMatrix(artifacts, shared)
+    pred, proba = scoreArtifacts(model_name, artifacts, X)
+
+    #put every model's columns in CLASSES order before averaging
+    aligned = np.zeros((len(proba), len(CLASSES)))
+    aligned[:, np.searchsorted(CLASSES, artifacts["model"].classes_)] = proba
+    return pred, aligned
+
+def predictEnsemble(df, weights=None):
+    weights = ENSEMBLE_WEIGHTS if weights is None else weights
+
+    #load on this thread: unpickling the first model imports sklearn, and
+    #concurrent first imports of the same package are not safe
+    artifacts = {}
+    for name in MODEL_NAMES:
+        if weights.get(name, 0) > 0:
+            try:
+                artifacts[name] = loadArtifacts(name)
+            except FileNotFoundError:
+                #a model without artifacts is left out; per_model shows who voted
+                continue
+    if not artifacts:
+        raise FileNotFoundError("no model of the ensemble is available")
+
+    feat = pp.buildFeatures(df)
+    shared = sharedFeatures(feat)
+    if len(df) > ENSEMBLE_THREAD_ROWS:
+        #one shared dict per model: threads must not race on the imputed cache
+        futures = {name: _ensemble_pool.submit(scoreFromFeatures, name, df, feat, arts, {**shared, "imputed": {}}) for name, arts in artifacts.items()}
+        per_model = {name: future.result() for name, future in futures.items()}
+    else:
+        per_model = {name: scoreFromFeatures(name, df, feat, arts, shared) for name, arts in artifacts.items()}
+
+    total = sum(weights[name] for name in per_model)
+    proba = sum(weights[name] * p for name, (_, p) in per_model.items()) / total
+    return CLASSES[proba.argmax(axis=1)], proba, per_model
+
+def predictStudentEnsemble(stud, weights=None):
+    pred, proba, per_model = predictEnsemble(stud, weights)
+    return pred[0], proba[0], {name: (p[0], pr[0]) for name, (p, pr) in per_model.items()}
+#--------------------------------------------------
@@ -0,0 +1,75 @@
+# mlp.py
+# The ANN's forward pass in plain NumPy. coefs_/intercepts_ are exported to
+# contiguous float32 arrays, and scoring is a chain of matrix products
+# (one GEMM per layer, in row blocks for big batches) with ReLU in place and
+# a softmax at the end. No sklearn validation or DataFrame handling per call.
+# float32 drifts from sklearn's float64 by ~1e-6; bench.py mlp checks it.
+#
+#   flat = FlatMLP.fromModel(model)
+#   proba = flat.predict_proba(X)        # X in the model's column order
+
+
+#import
+#--------------------------------------------------
+import numpy as np
+#--------------------------------------------------
+
+#forward pass
+#--------------------------------------------------
+ACTIVATIONS = {
+    "relu": lambda a: np.maximum(a, 0, out=a),
+    "tanh": lambda a: np.tanh(a, out=a),
+    "logistic": lambda a: np.divide(1, 1 + np.exp(-a, out=a), out=a),
+    "identity": lambda a: a,
+}
+
+class FlatMLP:
+    def __init__(self, coefs, intercepts, activation, classes, dtype=np.float32, batch_size=4096):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unknown activation {activation!r}, expected one of {list(ACTIVATIONS)}")
+        self.coefs = [np.ascontiguousarray(w, dtype=dtype) for w in coefs]
+        self.intercepts = [np.ascontiguousarray(b, dtype=dtype) for b in intercepts]
+        self.activation = activation
+        self.classes_ = np.asarray(classes)
+        self.batch_size = batch_size
+
+    @classmethod
+    def fromModel(cls, model, **kwargs):
+        if model.out_activation_ != "softmax":
+            raise ValueError(f"Only multiclass (softmax) MLPs are supported, got {model.out_activation_!r}")
+        return cls(model.coefs_, model.intercepts_, model.activation, model.classes_, **kwargs)
+
+    def _forward(self, a):
+        hidden = ACTIVATIONS[self.activation]
+        for w, b in zip(self.coefs[:-1], self.intercepts[:-1]):
+            a = a @ w
+            a += b
+            hidden(a)
+        out = (a @ self.coefs[-1]).astype(np.float64)
+        out += self.intercepts[-1]
+        #sklearn's softmax
+        out -= out.max(axis=1, keepdims=True)
+        np.exp(out, out=out)
+        out /= out.sum(axis=1, keepdims=True)
+        return out
+
+    #sklearn method names, so inference.scoreModel takes either
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=self.coefs[0].dtype)
+        if len(X) <= self.batch_size:
+            return self._forward(X)
+        #row blocks keep the hidden activations in cache for big batches
+        return np.concatenate([self._forward(X[i:i + self.batch_size]) for i in range(0, len(X), self.batch_size)])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def toArtifact(self):
+        return {"coefs": self.coefs, "intercepts": self.intercepts, "activation": self.activation, "classes": self.classes_}
+
+    @classmethod
+    def fromArtifact(cls, artifact):
+        if isinstance(artifact, cls):
+            return artifact
+        return cls(artifact["coefs"], artifact["intercepts"], artifact["activation"], artifact["classes"], dtype=artifact["coefs"][0].dtype)
+#--------------------------------------------------
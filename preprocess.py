@@ -2,39 +2,9 @@
 
 #import
 #--------------------------------------------------
+import functools
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
-
-from sklearn.model_selection import (
-    GridSearchCV,
-    train_test_split)
-
-from sklearn.ensemble import (
-    RandomForestClassifier,
-    HistGradientBoostingClassifier)
-
-from sklearn.metrics import (
-    confusion_matrix,
-    classification_report,
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score)
-
-from sklearn.impute import SimpleImputer
-
-from sklearn.preprocessing import (
-    StandardScaler,
-    MinMaxScaler)
-
-from sklearn.neural_network import MLPClassifier
-
-from sklearn.inspection import permutation_importance
-
-from imblearn.over_sampling import SMOTE
 #--------------------------------------------------
 
 #global constants
@@ -44,9 +14,29 @@ from imblearn.over_sampling import SMOTE
 
 #load csv
 #--------------------------------------------------
-DF_INIT = pd.read_csv("db/PredictStudentsDropoutAndAcademicSuccess.csv", sep=";")
-DF_USE = DF_INIT.sample(n=10, random_state=42)
-DF = DF_INIT.drop(DF_USE.index)
+#DF_INIT, DF_USE and DF are read on first access, not at import
+DATASET_PATH = "db/PredictStudentsDropoutAndAcademicSuccess.csv"
+
+def splitDataset(df_init):
+    #DF_USE: 10 students held back for the app, DF: the rest
+    df_use = df_init.sample(n=10, random_state=42)
+    return df_use, df_init.drop(df_use.index)
+
+@functools.lru_cache(maxsize=None)
+def loadDataset(path=DATASET_PATH):
+    #compact dtypes from DATASET_SCHEMA, codes checked against the code dictionaries,
+    #served from dataset.py's columnar cache once the CSV has been parsed. Read
+    #into memory rather than mapped, so DF_INIT is writable like a read_csv frame
+    import dataset
+    df_init = dataset.loadFrame("raw", path, mmap_mode=None)
+    df_use, df = splitDataset(df_init)
+    return df_init, df_use, df
+
+def __getattr__(name):
+    if name in ("DF_INIT", "DF_USE", "DF"):
+        df_init, df_use, df = loadDataset()
+        return {"DF_INIT": df_init, "DF_USE": df_use, "DF": df}[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 #--------------------------------------------------
 
 #data mapping
@@ -554,6 +544,99 @@ targetMap = {
 targetMapReverse = {v: k for k, v in targetMap.items()}
 #--------------------------------------------------
 
+#dataset schema
+#--------------------------------------------------
+#declared dtypes of the raw CSV, keyed by its headers. Coded columns get the
+#smallest integer type holding their largest known code, counts and ages int8,
+#the target a categorical over targetMap. Measured columns (grades, rates, gdp)
+#stay float64: float32 rounds values like 13.666667 or 1.74, which is enough to
+#move HistGradientBoosting predictions.
+FLOAT_COLUMNS = [
+    "previousQualificationGrade",
+    "admissionGrade",
+    "curricularUnits1stSemGrade",
+    "curricularUnits2ndSemGrade",
+    "unemploymentRate",
+    "inflationRate",
+    "gdp",
+]
+
+#code dictionaries above, by the column they describe
+CODE_MAPS = {col: globals()[col] for col in conversion_dict.values() if isinstance(globals().get(col), dict)}
+CODE_MAPS["target"] = targetMap
+
+def intType(high):
+    for dtype in (np.int8, np.int16, np.int32):
+        if high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def columnType(col):
+    if col == "target":
+        return pd.CategoricalDtype(list(targetMap))
+    if col in FLOAT_COLUMNS:
+        return np.dtype(np.float64)
+    if col in CODE_MAPS:
+        return intType(max(CODE_MAPS[col]))
+    return np.dtype(np.int8)
+
+DATASET_SCHEMA = {raw: columnType(col) for raw, col in conversion_dict.items()}
+
+def checkColumn(raw, values, dtype):
+    #raises on codes missing from the code dictionaries and on integers the
+    #declared type cannot hold (astype would wrap them silently)
+    col = conversion_dict.get(raw, raw)
+    if col in CODE_MAPS:
+        unknown = set(pd.unique(values).tolist()) - set(CODE_MAPS[col])
+        if unknown:
+            raise ValueError(f"{raw}: unknown codes {sorted(unknown, key=str)[:10]}, expected one of {sorted(CODE_MAPS[col])}")
+    if dtype.kind == "i":
+        if values.dtype.kind not in "iu":
+            raise ValueError(f"{raw}: expected whole numbers for {dtype}, read {values.dtype}")
+        info = np.iinfo(dtype)
+        low, high = values.min(), values.max()
+        if low < info.min or high > info.max:
+            raise ValueError(f"{raw}: values {low}..{high} do not fit {dtype}")
+
+def castColumn(values, dtype):
+    #values in the declared type, or None when they would not survive the cast:
+    #missing or fractional values in an integer column, integers that would
+    #wrap, target labels outside targetMap
+    if isinstance(dtype, pd.CategoricalDtype):
+        return values.astype(dtype) if set(pd.unique(values)) <= set(dtype.categories) else None
+    array = values.to_numpy()
+    if dtype.kind == "i":
+        if array.dtype.kind not in "iu":
+            return None
+        info = np.iinfo(dtype)
+        if len(array) and (array.min() < info.min or array.max() > info.max):
+            return None
+    return array.astype(dtype, copy=False)
+
+def applySchema(df, schema=None, validate=False):
+    #columns outside the schema, or whose values don't fit it, are kept as read.
+    #validate=True raises on those and on codes missing from the code
+    #dictionaries instead; otherwise unknown codes flow through to a NaN
+    #ordinal like any other code mapCodes doesn't know
+    schema = DATASET_SCHEMA if schema is None else schema
+    if validate:
+        for raw, dtype in schema.items():
+            if raw in df.columns:
+                checkColumn(raw, df[raw].to_numpy(), dtype)
+    columns = {}
+    for raw, values in df.items():
+        dtype = schema.get(raw)
+        cast = None if dtype is None else castColumn(values, dtype)
+        if dtype is not None and cast is None:
+            print(f"⚠️ '{raw}' kept as {values.dtype}: its values do not fit {dtype}")
+        columns[raw] = values if cast is None else cast
+    return pd.DataFrame(columns, index=df.index)
+
+def readDataset(path=DATASET_PATH, typed=True, validate=False):
+    df = pd.read_csv(path, sep=";")
+    return applySchema(df, validate=validate) if typed else df
+#--------------------------------------------------
+
 #common functions
 #--------------------------------------------------
 font = {
@@ -587,104 +670,136 @@ text_color = {
 }
 
 
+#feature engine
+#--------------------------------------------------
+#raw columns that are replaced by their engineered versions
+REPLACED_COLUMNS = [
+    "applicationOrder",
+    "previousQualification",
+    "motherQualification",
+    "fatherQualification",
+    "motherOccupation",
+    "fatherOccupation",
+]
+
+def mapCodes(values, mapping):
+    lookup = np.full(max(mapping) + 1, np.nan)
+    lookup[list(mapping.keys())] = list(mapping.values())
+    codes = np.asarray(values, dtype=float)
+    known = (codes >= 0) & (codes < len(lookup)) & (codes == np.floor(codes))
+    out = np.full(len(codes), np.nan)
+    out[known] = lookup[codes[known].astype(int)]
+    return out
+
+def safeRatio(num, den):
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.zeros(len(num))
+    np.divide(num, den, out=out, where=den != 0)
+    out[np.isnan(out)] = 0
+    return out
+
+def widen(values):
+    #int8/int16 columns from DATASET_SCHEMA are widened so sums cannot wrap
+    values = np.asarray(values)
+    return values.astype(np.int64) if values.dtype.kind in "iu" and values.dtype.itemsize < 8 else values
+
+def zeroNaN(values):
+    return np.where(np.isnan(values), 0, values)
+
+def pairMean(a, b):
+    return np.where(np.isnan(a), b, np.where(np.isnan(b), a, (a + b) / 2))
+
+#econ_to_year as a sorted integer index. Rates are rounded to hundredths before
+#packing, so float noise (e.g. 1.7399999 from float32 or arithmetic) still matches.
+ECON_KEY_SCALE = 100
+ECON_KEY_SPAN = 1 << 20
+
+def econKey(unemployment, inflation, gdp):
+    parts = np.rint(np.column_stack([unemployment, inflation, gdp]).astype(float) * ECON_KEY_SCALE)
+    valid = (np.isfinite(parts) & (np.abs(parts) < ECON_KEY_SPAN // 2)).all(axis=1)
+    shifted = np.where(valid[:, None], parts, 0).astype(np.int64) + ECON_KEY_SPAN // 2
+    keys = (shifted[:, 0] * ECON_KEY_SPAN + shifted[:, 1]) * ECON_KEY_SPAN + shifted[:, 2]
+    return keys, valid
+
+_econ_keys, _ = econKey(*zip(*econ_to_year.keys()))
+_econ_order = np.argsort(_econ_keys)
+ECON_KEYS = _econ_keys[_econ_order]
+ECON_YEARS = np.array(list(econ_to_year.values()), dtype=float)[_econ_order]
+
+def lookupYear(c):
+    keys, valid = econKey(c["unemploymentRate"], c["inflationRate"], c["gdp"])
+    pos = np.minimum(np.searchsorted(ECON_KEYS, keys), len(ECON_KEYS) - 1)
+    found = valid & (ECON_KEYS[pos] == keys)
+    return np.where(found, ECON_YEARS[pos], np.nan)
+
+#engineered columns shared by every model, computed in order over the whole batch.
+#each entry reads the raw columns and the entries above it.
+FEATURES = {
+    "applicationOrderShifted": lambda c: c["applicationOrder"] + 1,
+    "previousQualificationOrdinal": lambda c: mapCodes(c["previousQualification"], qualificationOrdinal),
+
+    "motherQualificationOrdinal": lambda c: mapCodes(c["motherQualification"], qualificationOrdinal),
+    "fatherQualificationOrdinal": lambda c: mapCodes(c["fatherQualification"], qualificationOrdinal),
+    "avgParentalEducation": lambda c: pairMean(c["motherQualificationOrdinal"], c["fatherQualificationOrdinal"]),
+    "parentalEduDisparity": lambda c: np.abs(c["motherQualificationOrdinal"] - c["fatherQualificationOrdinal"]),
+
+    "motherOccupationOrdinal": lambda c: mapCodes(c["motherOccupation"], occupationOrdinal),
+    "fatherOccupationOrdinal": lambda c: mapCodes(c["fatherOccupation"], occupationOrdinal),
+    "avgParentalIncome": lambda c: pairMean(c["motherOccupationOrdinal"], c["fatherOccupationOrdinal"]),
+    "parentalIncomeDisparity": lambda c: np.abs(c["motherOccupationOrdinal"] - c["fatherOccupationOrdinal"]),
+
+    "approvedRate1stSem": lambda c: safeRatio(c["curricularUnits1stSemApproved"], c["curricularUnits1stSemEnrolled"]),
+    "approvedRate2ndSem": lambda c: safeRatio(c["curricularUnits2ndSemApproved"], c["curricularUnits2ndSemEnrolled"]),
+    "performanceIndex1stSem": lambda c: zeroNaN(c["approvedRate1stSem"] * c["curricularUnits1stSemGrade"]),
+    "performanceIndex2ndSem": lambda c: zeroNaN(c["approvedRate2ndSem"] * c["curricularUnits2ndSemGrade"]),
+    "creditLoadReduction1stSem": lambda c: safeRatio(c["curricularUnits1stSemCredited"], c["curricularUnits1stSemEnrolled"]),
+    "creditLoadReduction2ndSem": lambda c: safeRatio(c["curricularUnits2ndSemCredited"], c["curricularUnits2ndSemEnrolled"]),
+    "evalRate1stSem": lambda c: safeRatio(c["curricularUnits1stSemEvaluations"], c["curricularUnits1stSemEvaluations"] + c["curricularUnits1stSemWithoutEvaluations"]),
+    "evalRate2ndSem": lambda c: safeRatio(c["curricularUnits2ndSemEvaluations"], c["curricularUnits2ndSemEvaluations"] + c["curricularUnits2ndSemWithoutEvaluations"]),
+    "noAcademicActivity": lambda c: (
+        (c["curricularUnits1stSemEnrolled"] == 0) &
+        (c["curricularUnits2ndSemEnrolled"] == 0) &
+        (c["curricularUnits1stSemEvaluations"] == 0) &
+        (c["curricularUnits2ndSemEvaluations"] == 0) &
+        (c["curricularUnits1stSemGrade"] == 0) &
+        (c["curricularUnits2ndSemGrade"] == 0)
+    ).astype(int),
+
+    "economicStressIndex": lambda c: c["unemploymentRate"] + c["inflationRate"] - c["gdp"],
+    "isEconomyGood": lambda c: ((c["gdp"] > 1.5) & (c["unemploymentRate"] < 10)).astype(int),
+    "year": lookupYear,
+}
+
+def buildFeatures(df, compute=None):
+    #compute(name, feature, c) replaces feature(c), e.g. featurestore.py's cached columns
+    df = df.rename(columns=conversion_dict)
+
+    c = {col: widen(df[col].to_numpy()) for col in df.columns if col != "target"}
+    for name, feature in FEATURES.items():
+        c[name] = feature(c) if compute is None else compute(name, feature, c)
+
+    kept = df.drop(columns=REPLACED_COLUMNS + ["target"], errors="ignore")
+    derived = pd.DataFrame({name: c[name] for name in FEATURES}, index=df.index)
+    feat = pd.concat([kept, derived], axis=1)
+
+    #target
+    if "target" in df.columns and len(df) > 1:
+        feat["targetInt"] = df["target"].map(targetMap).astype("Int64")
+
+    return feat
+#--------------------------------------------------
+
+
+
+
 #RandomForest
 #--------------------------------------------------
+def rfFromFeatures(feat):
+    return feat.copy()
+
 def rfPreProc(df_rf):
-    df_rf.rename(columns=conversion_dict, inplace=True)
-    
-    #maritalStatus
-    
-    #applicationMode
-    
-    #applicationOrder
-    df_rf["applicationOrderShifted"] = df_rf["applicationOrder"] + 1
-    df_rf = df_rf.drop("applicationOrder", axis=1)
-    
-    #course
-    
-    #daytimeEveningAttendance
-    
-    #previousQualification
-    df_rf["previousQualificationOrdinal"] = df_rf["previousQualification"].map(qualificationOrdinal)
-    df_rf = df_rf.drop("previousQualification", axis=1)
-    
-    #previousQualificationGrade
-    
-    #nationality
-    
-    #parent qualification
-    df_rf["motherQualificationOrdinal"] = df_rf["motherQualification"].map(qualificationOrdinal)
-    df_rf["fatherQualificationOrdinal"] = df_rf["fatherQualification"].map(qualificationOrdinal)
-    df_rf["avgParentalEducation"] = df_rf[["motherQualificationOrdinal", "fatherQualificationOrdinal"]].mean(axis=1)
-    df_rf["parentalEduDisparity"] = abs(df_rf["motherQualificationOrdinal"] - df_rf["fatherQualificationOrdinal"])
-    df_rf = df_rf.drop("motherQualification", axis=1)
-    df_rf = df_rf.drop("fatherQualification", axis=1)
-    
-    #parent occupation
-    df_rf["motherOccupationOrdinal"] = df_rf["motherOccupation"].map(occupationOrdinal)
-    df_rf["fatherOccupationOrdinal"] = df_rf["fatherOccupation"].map(occupationOrdinal)
-    df_rf["avgParentalIncome"] = df_rf[["motherOccupationOrdinal", "fatherOccupationOrdinal"]].mean(axis=1)
-    df_rf["parentalIncomeDisparity"] = abs(df_rf["motherOccupationOrdinal"] - df_rf["fatherOccupationOrdinal"])
-    df_rf = df_rf.drop("motherOccupation", axis=1)
-    df_rf = df_rf.drop("fatherOccupation", axis=1)
-    
-    #admissionGrade
-    
-    #displaced
-    
-    #educationalSpecialNeeds
-    
-    #tuitionFeesUpToDate
-    
-    #gender
-    
-    #scholarshipHolder
-    
-    #ageAtEnrollment
-    
-    #international
-    
-    #curricularUnits
-    df_rf["approvedRate1stSem"] = (df_rf["curricularUnits1stSemApproved"] / df_rf["curricularUnits1stSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_rf["approvedRate2ndSem"] = (df_rf["curricularUnits2ndSemApproved"] / df_rf["curricularUnits2ndSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_rf["performanceIndex1stSem"] = (df_rf["approvedRate1stSem"] * df_rf["curricularUnits1stSemGrade"]).fillna(0)
-    df_rf["performanceIndex2ndSem"] = (df_rf["approvedRate2ndSem"] * df_rf["curricularUnits2ndSemGrade"]).fillna(0)
-    df_rf["creditLoadReduction1stSem"] = (df_rf["curricularUnits1stSemCredited"] / df_rf["curricularUnits1stSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_rf["creditLoadReduction2ndSem"] = (df_rf["curricularUnits2ndSemCredited"] / df_rf["curricularUnits2ndSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_rf["evalRate1stSem"] = (df_rf["curricularUnits1stSemEvaluations"] / (df_rf["curricularUnits1stSemEvaluations"] + df_rf["curricularUnits1stSemWithoutEvaluations"]).replace(0, np.nan)).fillna(0)
-    df_rf["evalRate2ndSem"] = (df_rf["curricularUnits2ndSemEvaluations"] / (df_rf["curricularUnits2ndSemEvaluations"] + df_rf["curricularUnits2ndSemWithoutEvaluations"]).replace(0, np.nan)).fillna(0)
-    
-    inactive_mask = (
-        (df_rf["curricularUnits1stSemEnrolled"] == 0) &
-        (df_rf["curricularUnits2ndSemEnrolled"] == 0) &
-        (df_rf["curricularUnits1stSemEvaluations"] == 0) &
-        (df_rf["curricularUnits2ndSemEvaluations"] == 0) &
-        (df_rf["curricularUnits1stSemGrade"] == 0) &
-        (df_rf["curricularUnits2ndSemGrade"] == 0)
-    )
-    df_rf["noAcademicActivity"] = inactive_mask.astype(int)
-
-    #econ
-    df_rf["economicStressIndex"] = df_rf["unemploymentRate"] + df_rf["inflationRate"] - df_rf["gdp"]
-    df_rf["isEconomyGood"] = ((df_rf["gdp"] > 1.5) & (df_rf["unemploymentRate"] < 10)).astype(int)
-    
-    #year
-    df_rf["year"] = df_rf.apply(lambda row: econ_to_year.get((row["unemploymentRate"], row["inflationRate"], row["gdp"])),axis=1)
-    
-    #unemploymentRate
-    
-    #inflationRate
-    
-    #gdp
-    
-    #target
-    if len(df_rf) > 1:
-        df_rf["targetInt"] = (df_rf["target"].map(targetMap).astype("Int64"))
-    
-    if "target" in df_rf.columns:
-        df_rf = df_rf.drop("target", axis=1)
-    
-    return df_rf
+    return rfFromFeatures(buildFeatures(df_rf))
 #--------------------------------------------------
 
 
@@ -693,164 +808,217 @@ def rfPreProc(df_rf):
 #ANN
 #--------------------------------------------------
 
-scale_ann = {}
-
-def addGetScaleCol(df, col):
-    global scale_ann
-    if len(df) == 1:
-        scaler = scale_ann.get(col)
-        if scaler and col in df.columns:
-            df[col] = scaler.transform(df[[col]])
-        else:
-            print(f"⚠️ Skipping '{col}' — scaler missing or column not in df.")
-    else:
-        scaler = MinMaxScaler()
-        df[col] = scaler.fit_transform(df[[col]])
-        scale_ann[col] = scaler
-
-
-
-
-def annPreProc(df_ann):
-    df_ann.rename(columns=conversion_dict, inplace=True)
-    
-    #maritalStatus
-    df_ann = pd.get_dummies(df_ann, columns=["maritalStatus"], drop_first=False, dtype=int)
-    
-    #applicationMode
-    df_ann = pd.get_dummies(df_ann, columns=["applicationMode"], drop_first=False, dtype=int)
-    
-    #applicationOrder
-    df_ann["applicationOrderShifted"] = df_ann["applicationOrder"] + 1
-    addGetScaleCol(df_ann, "applicationOrderShifted")
-    df_ann = df_ann.drop("applicationOrder", axis=1)
-    
-    #course
-    df_ann = pd.get_dummies(df_ann, columns=["course"], drop_first=False, dtype=int)
-    
-    #daytimeEveningAttendance
-    df_ann = pd.get_dummies(df_ann, columns=["daytimeEveningAttendance"], drop_first=False, dtype=int)
-    
-    #previousQualification
-    df_ann["previousQualificationOrdinal"] = df_ann["previousQualification"].map(qualificationOrdinal)
-    addGetScaleCol(df_ann, "previousQualificationOrdinal")
-    df_ann = df_ann.drop("previousQualification", axis=1)
-    
-    #previousQualificationGrade
-    addGetScaleCol(df_ann, "previousQualificationGrade")
-    
-    #nationality
-    df_ann = pd.get_dummies(df_ann, columns=["nationality"], drop_first=False, dtype=int)
-    
-    #parent qualification
-    df_ann["motherQualificationOrdinal"] = df_ann["motherQualification"].map(qualificationOrdinal)
-    df_ann["fatherQualificationOrdinal"] = df_ann["fatherQualification"].map(qualificationOrdinal)
-    df_ann["avgParentalEducation"] = df_ann[["motherQualificationOrdinal", "fatherQualificationOrdinal"]].mean(axis=1)
-    df_ann["parentalEduDisparity"] = abs(df_ann["motherQualificationOrdinal"] - df_ann["fatherQualificationOrdinal"])
-    addGetScaleCol(df_ann, "motherQualificationOrdinal")
-    addGetScaleCol(df_ann, "fatherQualificationOrdinal")
-    addGetScaleCol(df_ann, "avgParentalEducation")
-    addGetScaleCol(df_ann, "parentalEduDisparity")
-    df_ann = df_ann.drop("motherQualification", axis=1)
-    df_ann = df_ann.drop("fatherQualification", axis=1)
-    
-    #parent occupation
-    df_ann["motherOccupationOrdinal"] = df_ann["motherOccupation"].map(occupationOrdinal)
-    df_ann["fatherOccupationOrdinal"] = df_ann["fatherOccupation"].map(occupationOrdinal)
-    df_ann["avgParentalIncome"] = df_ann[["motherOccupationOrdinal", "fatherOccupationOrdinal"]].mean(axis=1)
-    df_ann["parentalIncomeDisparity"] = abs(df_ann["motherOccupationOrdinal"] - df_ann["fatherOccupationOrdinal"])
-    addGetScaleCol(df_ann, "motherOccupationOrdinal")
-    addGetScaleCol(df_ann, "fatherOccupationOrdinal")
-    addGetScaleCol(df_ann, "avgParentalIncome")
-    addGetScaleCol(df_ann, "parentalIncomeDisparity")
-    df_ann = df_ann.drop("motherOccupation", axis=1)
-    df_ann = df_ann.drop("fatherOccupation", axis=1)
-    
-    #admissionGrade
-    addGetScaleCol(df_ann, "admissionGrade")
-    
-    #displaced
-    
-    #educationalSpecialNeeds
-    
-    #tuitionFeesUpToDate
-    
-    #gender
-    df_ann = pd.get_dummies(df_ann, columns=["gender"], drop_first=False, dtype=int)
-    
-    #scholarshipHolder
-    df_ann = pd.get_dummies(df_ann, columns=["scholarshipHolder"], drop_first=False, dtype=int)
-    
-    #ageAtEnrollment
-    addGetScaleCol(df_ann, "ageAtEnrollment")
-    
-    #international
-    
-    #curricularUnits
-    df_ann["approvedRate1stSem"] = (df_ann["curricularUnits1stSemApproved"] / df_ann["curricularUnits1stSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_ann["approvedRate2ndSem"] = (df_ann["curricularUnits2ndSemApproved"] / df_ann["curricularUnits2ndSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_ann["performanceIndex1stSem"] = (df_ann["approvedRate1stSem"] * df_ann["curricularUnits1stSemGrade"]).fillna(0)
-    df_ann["performanceIndex2ndSem"] = (df_ann["approvedRate2ndSem"] * df_ann["curricularUnits2ndSemGrade"]).fillna(0)
-    df_ann["creditLoadReduction1stSem"] = (df_ann["curricularUnits1stSemCredited"] / df_ann["curricularUnits1stSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_ann["creditLoadReduction2ndSem"] = (df_ann["curricularUnits2ndSemCredited"] / df_ann["curricularUnits2ndSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_ann["evalRate1stSem"] = (df_ann["curricularUnits1stSemEvaluations"] / (df_ann["curricularUnits1stSemEvaluations"] + df_ann["curricularUnits1stSemWithoutEvaluations"]).replace(0, np.nan)).fillna(0)
-    df_ann["evalRate2ndSem"] = (df_ann["curricularUnits2ndSemEvaluations"] / (df_ann["curricularUnits2ndSemEvaluations"] + df_ann["curricularUnits2ndSemWithoutEvaluations"]).replace(0, np.nan)).fillna(0)
-    
-    inactive_mask = (
-        (df_ann["curricularUnits1stSemEnrolled"] == 0) &
-        (df_ann["curricularUnits2ndSemEnrolled"] == 0) &
-        (df_ann["curricularUnits1stSemEvaluations"] == 0) &
-        (df_ann["curricularUnits2ndSemEvaluations"] == 0) &
-        (df_ann["curricularUnits1stSemGrade"] == 0) &
-        (df_ann["curricularUnits2ndSemGrade"] == 0)
-    )
-    df_ann["noAcademicActivity"] = inactive_mask.astype(int)
-    
-    addGetScaleCol(df_ann, "curricularUnits1stSemCredited")
-    addGetScaleCol(df_ann, "curricularUnits1stSemEnrolled")
-    addGetScaleCol(df_ann, "curricularUnits1stSemEvaluations")
-    addGetScaleCol(df_ann, "curricularUnits1stSemApproved")
-    addGetScaleCol(df_ann, "curricularUnits1stSemGrade")
-    addGetScaleCol(df_ann, "curricularUnits1stSemWithoutEvaluations")
-    
-    addGetScaleCol(df_ann, "curricularUnits2ndSemCredited")
-    addGetScaleCol(df_ann, "curricularUnits2ndSemEnrolled")
-    addGetScaleCol(df_ann, "curricularUnits2ndSemEvaluations")
-    addGetScaleCol(df_ann, "curricularUnits2ndSemApproved")
-    addGetScaleCol(df_ann, "curricularUnits2ndSemGrade")
-    addGetScaleCol(df_ann, "curricularUnits2ndSemWithoutEvaluations")
-    
-    addGetScaleCol(df_ann, "performanceIndex1stSem")
-    addGetScaleCol(df_ann, "performanceIndex2ndSem")
-    addGetScaleCol(df_ann, "creditLoadReduction1stSem")
-    addGetScaleCol(df_ann, "creditLoadReduction2ndSem")
-
-    #econ
-    df_ann["economicStressIndex"] = df_ann["unemploymentRate"] + df_ann["inflationRate"] - df_ann["gdp"]
-    addGetScaleCol(df_ann, "economicStressIndex")
-    df_ann["isEconomyGood"] = ((df_ann["gdp"] > 1.5) & (df_ann["unemploymentRate"] < 10)).astype(int)
-    
-    #year
-    df_ann["year"] = df_ann.apply(lambda row: econ_to_year.get((row["unemploymentRate"], row["inflationRate"], row["gdp"])),axis=1)
-    addGetScaleCol(df_ann, "year")
-    
-    #unemploymentRate
-    addGetScaleCol(df_ann, "unemploymentRate")
-    
-    #inflationRate
-    addGetScaleCol(df_ann, "inflationRate")
-    
-    #gdp
-    addGetScaleCol(df_ann, "gdp")
-    
-    #target
-    if len(df_ann) > 1:
-        df_ann["targetInt"] = (df_ann["target"].map(targetMap).astype("Int64"))
-    
-    if "target" in df_ann.columns:
-        df_ann = df_ann.drop("target", axis=1)
-    
+#one-hot encoded columns, each placed after the engineered column given (None = before all of them)
+ANN_ONE_HOT = {
+    "maritalStatus": None,
+    "applicationMode": None,
+    "course": "applicationOrderShifted",
+    "daytimeEveningAttendance": "applicationOrderShifted",
+    "nationality": "previousQualificationOrdinal",
+    "gender": "parentalIncomeDisparity",
+    "scholarshipHolder": "parentalIncomeDisparity",
+}
+
+#min-max scaled columns
+ANN_SCALED = [
+    "applicationOrderShifted",
+    "previousQualificationOrdinal",
+    "previousQualificationGrade",
+    "motherQualificationOrdinal",
+    "fatherQualificationOrdinal",
+    "avgParentalEducation",
+    "parentalEduDisparity",
+    "motherOccupationOrdinal",
+    "fatherOccupationOrdinal",
+    "avgParentalIncome",
+    "parentalIncomeDisparity",
+    "admissionGrade",
+    "ageAtEnrollment",
+    "curricularUnits1stSemCredited",
+    "curricularUnits1stSemEnrolled",
+    "curricularUnits1stSemEvaluations",
+    "curricularUnits1stSemApproved",
+    "curricularUnits1stSemGrade",
+    "curricularUnits1stSemWithoutEvaluations",
+    "curricularUnits2ndSemCredited",
+    "curricularUnits2ndSemEnrolled",
+    "curricularUnits2ndSemEvaluations",
+    "curricularUnits2ndSemApproved",
+    "curricularUnits2ndSemGrade",
+    "curricularUnits2ndSemWithoutEvaluations",
+    "performanceIndex1stSem",
+    "performanceIndex2ndSem",
+    "creditLoadReduction1stSem",
+    "creditLoadReduction2ndSem",
+    "economicStressIndex",
+    "year",
+    "unemploymentRate",
+    "inflationRate",
+    "gdp",
+]
+
+#fitted min-max scaling for the ANN frame, stored as one min_/scale_ pair of
+#arrays over the scaled columns and applied to the whole block in one step.
+#Fit once on training data, then transform batches of any size; transform
+#never mutates the scaler, so one instance can be shared between threads.
+class AnnScaler:
+    def __init__(self, columns=None, data_min=None, data_max=None):
+        self.columns = list(columns if columns is not None else ANN_SCALED)
+        self.data_min_ = None if data_min is None else np.asarray(data_min, dtype=float)
+        self.data_max_ = None if data_max is None else np.asarray(data_max, dtype=float)
+        self._updateScale()
+
+    def _updateScale(self):
+        if self.data_min_ is None:
+            self.min_ = self.scale_ = None
+            return
+        #same arithmetic as sklearn's MinMaxScaler, constant columns keep a range of 1
+        data_range = self.data_max_ - self.data_min_
+        data_range[data_range < 10 * np.finfo(data_range.dtype).eps] = 1.0
+        self.scale_ = 1.0 / data_range
+        self.min_ = 0.0 - self.data_min_ * self.scale_
+
+    def partialFit(self, df_ann):
+        block = df_ann[self.columns].to_numpy(dtype=float)
+        block_min = np.nanmin(block, axis=0)
+        block_max = np.nanmax(block, axis=0)
+        if self.data_min_ is not None:
+            block_min = np.fmin(self.data_min_, block_min)
+            block_max = np.fmax(self.data_max_, block_max)
+        self.data_min_, self.data_max_ = block_min, block_max
+        self._updateScale()
+        return self
+
+    def fit(self, df_ann):
+        self.data_min_ = self.data_max_ = None
+        return self.partialFit(df_ann)
+
+    def transform(self, df_ann):
+        df_ann = df_ann.copy()
+        missing = [col for col in self.columns if col not in df_ann.columns]
+        for col in missing:
+            print(f"⚠️ Skipping '{col}' — column not in df.")
+
+        present = [i for i, col in enumerate(self.columns) if col not in missing]
+        cols = [self.columns[i] for i in present]
+        block = df_ann[cols].to_numpy(dtype=float, copy=True)
+        block *= self.scale_[present]
+        block += self.min_[present]
+        df_ann[cols] = block
+        return df_ann
+
+    def fitTransform(self, df_ann):
+        return self.fit(df_ann).transform(df_ann)
+
+    def toArtifact(self):
+        return {"columns": self.columns, "dataMin": self.data_min_, "dataMax": self.data_max_}
+
+    @classmethod
+    def fromArtifact(cls, artifact):
+        if isinstance(artifact, cls):
+            return artifact
+        if "dataMin" in artifact:
+            return cls(artifact["columns"], artifact["dataMin"], artifact["dataMax"])
+        #legacy model_ann_scalers.pkl: one fitted 1-column MinMaxScaler per column
+        columns = list(artifact)
+        return cls(
+            columns,
+            np.concatenate([artifact[col].data_min_ for col in columns]),
+            np.concatenate([artifact[col].data_max_ for col in columns]))
+
+#one-hot vocabulary, fixed from the code dictionaries rather than from whatever
+#codes happen to be in a batch
+ANN_VOCABULARY = {
+    "maritalStatus": sorted(maritalStatus),
+    "applicationMode": sorted(applicationMode),
+    "course": sorted(course),
+    "daytimeEveningAttendance": sorted(daytimeEveningAttendance),
+    "nationality": sorted(nationality),
+    "gender": sorted(gender),
+    "scholarshipHolder": sorted(scholarshipHolder),
+}
+
+def annColumns():
+    raw = [col for col in conversion_dict.values() if col not in [*REPLACED_COLUMNS, *ANN_ONE_HOT, "target"]]
+    dummies = {col: [f"{col}_{code}" for code in ANN_VOCABULARY[col]] for col in ANN_ONE_HOT}
+
+    columns = raw + [name for col, after in ANN_ONE_HOT.items() if after is None for name in dummies[col]]
+    for feature in FEATURES:
+        columns.append(feature)
+        columns += [name for col, after in ANN_ONE_HOT.items() if after == feature for name in dummies[col]]
+    return columns
+
+ANN_COLUMNS = annColumns()
+
+#writes the ANN input straight into one preallocated matrix in the final
+#column order: numeric columns are copied, one-hot columns are set through a
+#code -> output position lookup, scaling is applied in place. Codes outside
+#the column list leave their block at 0, as the old reindex(fill_value=0) did.
+class AnnEncoder:
+    def __init__(self, columns=None):
+        self.columns = list(columns if columns is not None else ANN_COLUMNS)
+        self.position = {col: i for i, col in enumerate(self.columns)}
+
+        one_hot = {}
+        for i, name in enumerate(self.columns):
+            col, _, code = name.rpartition("_")
+            if col in ANN_ONE_HOT:
+                one_hot.setdefault(col, {})[int(float(code))] = i
+        self.lookups = {}
+        for col, positions in one_hot.items():
+            lookup = np.full(max(positions) + 1, -1)
+            lookup[list(positions.keys())] = list(positions.values())
+            self.lookups[col] = lookup
+
+        dummies = {i for positions in one_hot.values() for i in positions.values()}
+        self.numeric = [(i, col) for i, col in enumerate(self.columns) if i not in dummies]
+
+    def transform(self, feat, scaler=None):
+        #one float conversion for every column read, not one per column
+        read = [col for _, col in self.numeric if col in feat.columns] + list(self.lookups)
+        block = feat[read].to_numpy(dtype=float, na_value=np.nan)
+        return self.transformMatrix(block, {col: j for j, col in enumerate(read)}, scaler)
+
+    def transformMatrix(self, block, position, scaler=None):
+        #block: float feature matrix, position: feature name -> its column in block
+        out = np.zeros((len(block), len(self.columns)))
+        present = [(i, position[col]) for i, col in self.numeric if col in position]
+        out[:, [i for i, _ in present]] = block[:, [j for _, j in present]]
+
+        rows = np.arange(len(block))
+        for col, lookup in self.lookups.items():
+            codes = block[:, position[col]]
+            known = (codes >= 0) & (codes < len(lookup)) & (codes == np.floor(codes))
+            target = np.full(len(block), -1)
+            target[known] = lookup[codes[known].astype(int)]
+            hit = target >= 0
+            out[rows[hit], target[hit]] = 1
+
+        if scaler is not None:
+            idx = [self.position[col] for col in scaler.columns]
+            out[:, idx] *= scaler.scale_
+            out[:, idx] += scaler.min_
+        return out
+
+ANN_ENCODER = AnnEncoder()
+
+def annEncode(feat, encoder=None, scaler=None):
+    encoder = encoder or ANN_ENCODER
+    df_ann = pd.DataFrame(encoder.transform(feat, scaler), columns=encoder.columns, index=feat.index)
+    if "targetInt" in feat.columns:
+        df_ann["targetInt"] = feat["targetInt"]
     return df_ann
+
+def annFromFeatures(feat, scaler, encoder=None):
+    return annEncode(feat, encoder, scaler)
+
+def annPreProc(df_ann, scaler, encoder=None):
+    return annFromFeatures(buildFeatures(df_ann), scaler, encoder)
+
+def annFitPreProc(df_ann):
+    df_ann = annEncode(buildFeatures(df_ann))
+    scaler = AnnScaler().fit(df_ann)
+    return scaler.transform(df_ann), scaler
 #--------------------------------------------------
 
 
@@ -858,103 +1026,9 @@ def annPreProc(df_ann):
 
 #HistGradientBoostingClassifier
 #--------------------------------------------------
+def hgbFromFeatures(feat):
+    return feat.copy()
 
 def hgbPreProc(df_hgb):
-    df_hgb.rename(columns=conversion_dict, inplace=True)
-    
-    #maritalStatus
-    
-    #applicationMode
-    
-    #applicationOrder
-    df_hgb["applicationOrderShifted"] = df_hgb["applicationOrder"] + 1
-    df_hgb = df_hgb.drop("applicationOrder", axis=1)
-    
-    #course
-    
-    #daytimeEveningAttendance
-    
-    #previousQualification
-    df_hgb["previousQualificationOrdinal"] = df_hgb["previousQualification"].map(qualificationOrdinal)
-    df_hgb = df_hgb.drop("previousQualification", axis=1)
-    
-    #previousQualificationGrade
-    
-    #nationality
-    
-    #parent qualification
-    df_hgb["motherQualificationOrdinal"] = df_hgb["motherQualification"].map(qualificationOrdinal)
-    df_hgb["fatherQualificationOrdinal"] = df_hgb["fatherQualification"].map(qualificationOrdinal)
-    df_hgb["avgParentalEducation"] = df_hgb[["motherQualificationOrdinal", "fatherQualificationOrdinal"]].mean(axis=1)
-    df_hgb["parentalEduDisparity"] = abs(df_hgb["motherQualificationOrdinal"] - df_hgb["fatherQualificationOrdinal"])
-    df_hgb = df_hgb.drop("motherQualification", axis=1)
-    df_hgb = df_hgb.drop("fatherQualification", axis=1)
-    
-    #parent occupation
-    df_hgb["motherOccupationOrdinal"] = df_hgb["motherOccupation"].map(occupationOrdinal)
-    df_hgb["fatherOccupationOrdinal"] = df_hgb["fatherOccupation"].map(occupationOrdinal)
-    df_hgb["avgParentalIncome"] = df_hgb[["motherOccupationOrdinal", "fatherOccupationOrdinal"]].mean(axis=1)
-    df_hgb["parentalIncomeDisparity"] = abs(df_hgb["motherOccupationOrdinal"] - df_hgb["fatherOccupationOrdinal"])
-    df_hgb = df_hgb.drop("motherOccupation", axis=1)
-    df_hgb = df_hgb.drop("fatherOccupation", axis=1)
-    
-    #admissionGrade
-    
-    #displaced
-    
-    #educationalSpecialNeeds
-    
-    #tuitionFeesUpToDate
-    
-    #gender
-    
-    #scholarshipHolder
-    
-    #ageAtEnrollment
-    
-    #international
-    
-    #curricularUnits
-    df_hgb["approvedRate1stSem"] = (df_hgb["curricularUnits1stSemApproved"] / df_hgb["curricularUnits1stSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_hgb["approvedRate2ndSem"] = (df_hgb["curricularUnits2ndSemApproved"] / df_hgb["curricularUnits2ndSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_hgb["performanceIndex1stSem"] = (df_hgb["approvedRate1stSem"] * df_hgb["curricularUnits1stSemGrade"]).fillna(0)
-    df_hgb["performanceIndex2ndSem"] = (df_hgb["approvedRate2ndSem"] * df_hgb["curricularUnits2ndSemGrade"]).fillna(0)
-    df_hgb["creditLoadReduction1stSem"] = (df_hgb["curricularUnits1stSemCredited"] / df_hgb["curricularUnits1stSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_hgb["creditLoadReduction2ndSem"] = (df_hgb["curricularUnits2ndSemCredited"] / df_hgb["curricularUnits2ndSemEnrolled"].replace(0, np.nan)).fillna(0)
-    df_hgb["evalRate1stSem"] = (df_hgb["curricularUnits1stSemEvaluations"] / (df_hgb["curricularUnits1stSemEvaluations"] + df_hgb["curricularUnits1stSemWithoutEvaluations"]).replace(0, np.nan)).fillna(0)
-    df_hgb["evalRate2ndSem"] = (df_hgb["curricularUnits2ndSemEvaluations"] / (df_hgb["curricularUnits2ndSemEvaluations"] + df_hgb["curricularUnits2ndSemWithoutEvaluations"]).replace(0, np.nan)).fillna(0)
-    
-    inactive_mask = (
-        (df_hgb["curricularUnits1stSemEnrolled"] == 0) &
-        (df_hgb["curricularUnits2ndSemEnrolled"] == 0) &
-        (df_hgb["curricularUnits1stSemEvaluations"] == 0) &
-        (df_hgb["curricularUnits2ndSemEvaluations"] == 0) &
-        (df_hgb["curricularUnits1stSemGrade"] == 0) &
-        (df_hgb["curricularUnits2ndSemGrade"] == 0)
-    )
-    df_hgb["noAcademicActivity"] = inactive_mask.astype(int)
-
-    #econ
-    df_hgb["economicStressIndex"] = df_hgb["unemploymentRate"] + df_hgb["inflationRate"] - df_hgb["gdp"]
-    df_hgb["isEconomyGood"] = ((df_hgb["gdp"] > 1.5) & (df_hgb["unemploymentRate"] < 10)).astype(int)
-    
-    #year
-    df_hgb["year"] = df_hgb.apply(lambda row: econ_to_year.get((row["unemploymentRate"], row["inflationRate"], row["gdp"])),axis=1)
-    
-    #unemploymentRate
-    
-    #inflationRate
-    
-    #gdp
-    
-    #target
-    if len(df_hgb) > 1:
-        df_hgb["targetInt"] = (df_hgb["target"].map(targetMap).astype("Int64"))
-    
-    if "target" in df_hgb.columns:
-        df_hgb = df_hgb.drop("target", axis=1)
-    
-    return df_hgb
-
-
-#--------------------------------------------------
\ No newline at end of file
+    return hgbFromFeatures(buildFeatures(df_hgb))
+#--------------------------------------------------
@@ -0,0 +1,111 @@
+# registry.py
+# Process-wide cache of joblib artifacts. Streamlit imports modules once per
+# process, so every session shares the same REGISTRY.
+
+
+#import
+#--------------------------------------------------
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+#--------------------------------------------------
+
+#registry
+#--------------------------------------------------
+def fileSignature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def fileHash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, loader=joblib.load):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self._entries = {}
+        self._raw = {}
+        self._stats = {}
+
+    def _pathLock(self, path):
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    def _count(self, path, key, amount=1):
+        stats = self._stats.setdefault(path, {"hits": 0, "misses": 0, "reloads": 0, "loadSeconds": 0.0})
+        stats[key] += amount
+
+    #convert turns the unpickled object into what callers use (e.g. legacy
+    #scaler dicts into an AnnScaler), cached alongside it; loader overrides
+    #the registry's default for this path (e.g. bundle.loadBundle). The
+    #unpickled object is kept per path too, so several converters over one
+    #file (the model and its NumPy engine) read it once.
+    def load(self, path, convert=None, loader=None):
+        key = (path, convert)
+        signature = fileSignature(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._count(path, "hits")
+                return entry[1]
+
+        #one loader per path, so concurrent sessions don't deserialise the same file twice
+        with self._pathLock(path):
+            signature = fileSignature(path)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == signature:
+                    self._count(path, "hits")
+                    return entry[1]
+
+            start = time.perf_counter()
+            raw_key = (path, loader)
+            with self._lock:
+                raw = self._raw.get(raw_key)
+            loaded = raw is None or raw[0] != signature
+            obj = (loader or self._loader)(path) if loaded else raw[1]
+            raw = (signature, obj)
+            if convert is not None:
+                obj = convert(obj)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._count(path, "misses" if loaded else "hits")
+                self._count(path, "loadSeconds", elapsed)
+                if entry is not None:
+                    self._count(path, "reloads")
+                self._raw[raw_key] = raw
+                self._entries[key] = (signature, obj)
+            return obj
+
+    def version(self, path):
+        return fileSignature(path)
+
+    def stats(self):
+        with self._lock:
+            per_path = {path: dict(stats) for path, stats in self._stats.items()}
+        total = {"hits": 0, "misses": 0, "reloads": 0, "loadSeconds": 0.0}
+        for stats in per_path.values():
+            for key in total:
+                total[key] += stats[key]
+        return {"total": total, "artifacts": per_path}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._raw.clear()
+            self._stats.clear()
+
+
+REGISTRY = ModelRegistry()
+#--------------------------------------------------
@@ -0,0 +1,117 @@
+# resample.py
+# SMOTE inside cross-validation, done once per fold. Each training fold is
+# imputed and resampled on its own, so no synthetic sample is built from a
+# validation row, and the result is stored on disk keyed by the data, the
+# fold and the SMOTE parameters. Every estimator and every hyperparameter
+# candidate that sees the same frame and folds loads the stored fold instead
+# of running SMOTE's k-NN again (the RF and HGB frames are identical, so they
+# share their folds).
+#
+#   X_stack, y_stack, splits = stackFolds(X_train, y_train, cv=5)
+#   GridSearchCV(model, grid, cv=splits, refit=False).fit(X_stack, y_stack)
+
+
+#import
+#--------------------------------------------------
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from sklearn.model_selection import StratifiedKFold
+from sklearn.impute import SimpleImputer
+from imblearn.over_sampling import SMOTE
+#--------------------------------------------------
+
+#fold cache
+#--------------------------------------------------
+CACHE_DIR = ".cache/folds"
+SMOTE_PARAMS = {"random_state": 42}
+
+def dataHash(X, y):
+    return joblib.hash((list(X.columns), X.to_numpy(), np.asarray(y, dtype=int)))
+
+def cvFolds(y, cv=5, random_state=42):
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    return [(f"{k}of{cv}-seed{random_state}", train_idx, val_idx) for k, (train_idx, val_idx) in enumerate(folds.split(np.zeros(len(y)), y))]
+
+
+class FoldCache:
+    def __init__(self, cache_dir=CACHE_DIR, smote_params=None, impute=True):
+        self.cache_dir = cache_dir
+        self.smote_params = SMOTE_PARAMS if smote_params is None else smote_params
+        self.impute = impute
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, data_hash, fold_id):
+        key = joblib.hash([data_hash, fold_id, sorted(self.smote_params.items()), self.impute])
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def resample(self, X, y, train_idx, val_idx, fold_id, data_hash=None):
+        path = self.path(data_hash or dataHash(X, y), fold_id)
+        if os.path.exists(path):
+            self.hits += 1
+            return joblib.load(path, mmap_mode="r")
+        self.misses += 1
+
+        X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+        y = np.asarray(y, dtype=int)
+        y_train, y_val = y[train_idx], y[val_idx]
+
+        #fit on the training fold only, same steps as rfTrainEval/hgbTrainEval
+        imputer = None
+        if self.impute:
+            imputer = SimpleImputer(strategy="mean")
+            X_train = pd.DataFrame(imputer.fit_transform(X_train), columns=X.columns)
+            X_val = pd.DataFrame(imputer.transform(X_val), columns=X.columns) if len(val_idx) else X_val
+        X_res, y_res = SMOTE(**self.smote_params).fit_resample(X_train, y_train)
+
+        fold = {
+            "X_train": np.ascontiguousarray(X_res, dtype=float),
+            "y_train": np.asarray(y_res),
+            "X_val": np.ascontiguousarray(X_val, dtype=float),
+            "y_val": y_val,
+            "imputer": imputer,
+        }
+        #uncompressed, so later loads memory-map the arrays; tmp + replace so a
+        #parallel or interrupted run never leaves a partial fold behind
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        joblib.dump(fold, tmp)
+        os.replace(tmp, path)
+        return fold
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+#--------------------------------------------------
+
+#cv helpers
+#--------------------------------------------------
+def resampledFolds(X, y, cv=5, random_state=42, cache=None):
+    cache = FoldCache() if cache is None else cache
+    data_hash = dataHash(X, y)
+    return [cache.resample(X, y, train_idx, val_idx, fold_id, data_hash) for fold_id, train_idx, val_idx in cvFolds(y, cv, random_state)]
+
+def resampledTrain(X, y, cache=None):
+    #the whole training split as one "fold", for the final refit
+    cache = FoldCache() if cache is None else cache
+    return cache.resample(X, y, np.arange(len(X)), np.array([], dtype=int), "all")
+
+def stackFolds(X, y, cv=5, random_state=42, cache=None):
+    #one matrix holding every fold's resampled train rows followed by its
+    #validation rows, with cv splits pointing into it; any sklearn search can
+    #then run on plain estimators without resampling anything itself
+    blocks_X, blocks_y, splits = [], [], []
+    offset = 0
+    for fold in resampledFolds(X, y, cv, random_state, cache):
+        n_train, n_val = len(fold["y_train"]), len(fold["y_val"])
+        blocks_X += [fold["X_train"], fold["X_val"]]
+        blocks_y += [fold["y_train"], fold["y_val"]]
+        splits.append((np.arange(offset, offset + n_train), np.arange(offset + n_train, offset + n_train + n_val)))
+        offset += n_train + n_val
+
+    X_stack = pd.DataFrame(np.concatenate(blocks_X), columns=X.columns)
+    return X_stack, np.concatenate(blocks_y), splits
+#--------------------------------------------------
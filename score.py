@@ -0,0 +1,75 @@
+# score.py
+# Batch scorer for a whole cohort CSV in the same ";"-separated schema as
+# db/PredictStudentsDropoutAndAcademicSuccess.csv.
+#
+#   python score.py cohort.csv --model HistGradientBoosting --output predictions.csv
+
+
+#import
+#--------------------------------------------------
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+import preprocess as pp
+import inference
+import cache
+#--------------------------------------------------
+
+#score
+#--------------------------------------------------
+def scoreChunk(model_name, chunk, predictions=None):
+    if predictions is None:
+        pred, proba = inference.predictBatch(model_name, chunk)
+    else:
+        pred, proba = predictions.predict(model_name, chunk)
+
+    out = pd.DataFrame(index=chunk.index)
+    out["prediction"] = [pp.targetMapReverse[int(p)] for p in pred]
+    for i, p in enumerate(proba.T):
+        out[f"proba{pp.targetMapReverse[i]}"] = p
+    if "Target" in chunk.columns:
+        out["target"] = chunk["Target"]
+    return out
+
+def scoreCsv(input_path, output_path, model_name, chunksize=10_000, log=sys.stderr, predictions=None):
+    rows = 0
+    start = time.perf_counter()
+
+    for i, chunk in enumerate(pd.read_csv(input_path, sep=";", chunksize=chunksize)):
+        chunk_start = time.perf_counter()
+        out = scoreChunk(model_name, chunk, predictions)
+        out.to_csv(output_path, sep=";", index_label="row", mode="w" if i == 0 else "a", header=i == 0)
+
+        rows += len(chunk)
+        elapsed = time.perf_counter() - chunk_start
+        print(f"chunk {i}: {len(chunk):,} rows in {elapsed:.2f}s ({len(chunk) / elapsed:,.0f} rows/s)", file=log)
+
+    total = time.perf_counter() - start
+    print(f"scored {rows:,} rows with {model_name} in {total:.2f}s ({rows / total if total else 0:,.0f} rows/s)", file=log)
+    if predictions is not None:
+        print(f"prediction cache: {predictions.stats()}", file=log)
+    return rows
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every student in a CSV.")
+    parser.add_argument("input", help="';'-separated CSV in the dataset schema")
+    parser.add_argument("--model", choices=inference.MODEL_NAMES + [inference.ENSEMBLE], default="HistGradientBoosting")
+    parser.add_argument("--output", help="where to write predictions (default: <input>.predictions.csv)")
+    parser.add_argument("--chunksize", type=int, default=10_000, help="rows read and scored per chunk")
+    parser.add_argument("--cache", help="prediction cache file, reused and updated so reruns only score changed students")
+    parser.add_argument("--cache-size", type=int, default=1_000_000, help="most cached predictions kept")
+    args = parser.parse_args()
+
+    predictions = None
+    if args.cache:
+        predictions = cache.PredictionCache(max_entries=args.cache_size)
+        if os.path.exists(args.cache):
+            predictions.load(args.cache)
+
+    scoreCsv(args.input, args.output or f"{args.input}.predictions.csv", args.model, args.chunksize, predictions=predictions)
+    if predictions is not None:
+        predictions.save(args.cache)
@@ -0,0 +1,246 @@
+# server.py
+# JSON prediction service for systems that can't drive the Streamlit form.
+# Plain asyncio HTTP/1.1 (no extra dependency); predict runs on the per-model
+# micro-batchers from batching.py, so the event loop keeps accepting requests
+# while a batch is scored and concurrent requests share one predict call.
+#
+#   python server.py --port 8000
+#   curl -X POST localhost:8000/predict -d '{"model": "ANN", "students": [{...}]}'
+#
+# A request body is either one student record or {"model": ..., "students": [...]},
+# with the camelCase field names from preprocess.conversion_dict. Values are
+# checked against preprocess.DATASET_SCHEMA (types, known codes) up front: a bad
+# record gets a 400 naming the field and never joins a shared batch.
+
+
+#import
+#--------------------------------------------------
+import argparse
+import asyncio
+import collections
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import preprocess as pp
+import inference
+import batching
+import cache
+from registry import REGISTRY
+#--------------------------------------------------
+
+#schema
+#--------------------------------------------------
+INPUT_COLUMNS = [col for col in pp.conversion_dict.values() if col != "target"]
+#declared dtype per field, from preprocess.DATASET_SCHEMA
+INPUT_TYPES = {col: pp.DATASET_SCHEMA[raw] for raw, col in pp.conversion_dict.items() if col != "target"}
+DEFAULT_MODEL = "HistGradientBoosting"
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def parseStudents(payload):
+    if isinstance(payload, dict) and "students" in payload:
+        model_name = payload.get("model", DEFAULT_MODEL)
+        records = payload["students"]
+    elif isinstance(payload, dict):
+        model_name = payload.pop("model", DEFAULT_MODEL)
+        records = [payload]
+    else:
+        raise RequestError(400, "body must be a student record or {\"students\": [...]}")
+
+    choices = inference.MODEL_NAMES + [inference.ENSEMBLE]
+    if model_name not in choices:
+        raise RequestError(400, f"unknown model {model_name!r}, expected one of {choices}")
+    if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+        raise RequestError(400, "students must be a non-empty list of records")
+
+    missing = sorted({col for r in records for col in INPUT_COLUMNS if col not in r})
+    if missing:
+        raise RequestError(400, f"missing fields: {missing}")
+
+    return model_name, pd.DataFrame({col: checkField(col, [r[col] for r in records]) for col in INPUT_COLUMNS})
+
+def isNumber(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return bool(np.isfinite(float(value)))
+    except OverflowError:
+        return False
+
+def checkField(col, values):
+    #every record is checked before anything is queued, so one bad student
+    #never reaches a shared batch
+    for i, value in enumerate(values):
+        if not isNumber(value):
+            raise RequestError(400, f"{col}: expected a number, got {value!r} (student {i})")
+    dtype = INPUT_TYPES[col]
+    array = np.array(values, dtype=float)
+    if dtype.kind == "i":
+        fractional = np.flatnonzero(array != np.floor(array))
+        if len(fractional):
+            raise RequestError(400, f"{col}: expected a whole number, got {values[fractional[0]]!r} (student {fractional[0]})")
+        array = array.astype(np.int64)
+    try:
+        pp.checkColumn(col, array, dtype)
+    except ValueError as e:
+        raise RequestError(400, str(e))
+    return array
+
+def formatPredictions(pred, proba):
+    return [
+        {
+            "prediction": pp.targetMapReverse[int(p)],
+            "probabilities": {pp.targetMapReverse[i]: float(v) for i, v in enumerate(row)},
+        }
+        for p, row in zip(pred, proba)
+    ]
+#--------------------------------------------------
+
+#server
+#--------------------------------------------------
+class PredictionServer:
+    def __init__(self, workers=1, max_batch_size=64, max_wait_ms=5, cache_size=10_000, cache_ttl=3600, latency_window=10_000):
+        self.batcher_options = {"workers": workers, "max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms}
+        self.cache = cache.PredictionCache(max_entries=cache_size, ttl_seconds=cache_ttl) if cache_size > 0 else None
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.requests = 0
+        self.errors = 0
+
+    def preload(self):
+        loaded = []
+        for model_name in inference.MODEL_NAMES:
+            try:
+                inference.loadArtifacts(model_name)
+                loaded.append(model_name)
+            except FileNotFoundError as e:
+                print(f"⚠️ {model_name} not available: {e}")
+        return loaded
+
+    def latencyStats(self):
+        if not self.latencies:
+            return {"count": 0}
+        ms = np.array(self.latencies) * 1000
+        return {
+            "count": len(ms),
+            "p50Ms": float(np.percentile(ms, 50)),
+            "p99Ms": float(np.percentile(ms, 99)),
+            "maxMs": float(ms.max()),
+        }
+
+    async def predict(self, body):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise RequestError(400, "body is not valid JSON")
+        model_name, students = parseStudents(payload)
+
+        if self.cache is None:
+            pred, proba = await self.score(model_name, students)
+        else:
+            #only rows the cache doesn't know go to the batcher
+            keys, values, missing = self.cache.split(model_name, students)
+            pred = proba = None
+            if missing:
+                pred, proba = await self.score(model_name, students.iloc[missing])
+            pred, proba = self.cache.fill(model_name, keys, values, missing, pred, proba)
+        return {"model": model_name, "predictions": formatPredictions(pred, proba)}
+
+    async def score(self, model_name, students):
+        batcher = batching.getBatcher(model_name, **self.batcher_options)
+        try:
+            return await asyncio.wrap_future(batcher.submit(students))
+        except FileNotFoundError:
+            raise RequestError(503, f"model {model_name!r} is not available")
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/stats":
+            return 200, {"requests": self.requests, "errors": self.errors, "latency": self.latencyStats(), "batching": batching.batcherStats(), "registry": REGISTRY.stats(), "cache": self.cache.stats() if self.cache else None}
+        if method == "POST" and path == "/predict":
+            return 200, await self.predict(body)
+        raise RequestError(404, f"no route for {method} {path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": "body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                start = time.perf_counter()
+                try:
+                    status, result = await self.route(method, target.split("?", 1)[0], body)
+                except RequestError as e:
+                    status, result = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, result = 500, {"error": f"{type(e).__name__}: {e}"}
+                self.requests += 1
+                if status >= 400:
+                    self.errors += 1
+                elif method == "POST":
+                    self.latencies.append(time.perf_counter() - start)
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, result, keep_alive=True):
+        body = json.dumps(result).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8000, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve student outcome predictions over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="predict worker threads per model")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="most rows scored in one predict call")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="how long a batch waits for more requests")
+    parser.add_argument("--cache-size", type=int, default=10_000, help="most cached predictions kept, 0 disables the cache")
+    parser.add_argument("--cache-ttl", type=float, default=3600, help="seconds a cached prediction stays valid")
+    args = parser.parse_args()
+
+    app = PredictionServer(workers=args.workers, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, cache_size=args.cache_size, cache_ttl=args.cache_ttl)
+    print(f"preloaded: {app.preload()}")
+    print(f"listening on http://{args.host}:{args.port}")
+    asyncio.run(app.serve(args.host, args.port))
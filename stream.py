@@ -0,0 +1,61 @@
+# stream.py
+# Chunked preprocessing for extracts that don't fit in memory. Sources are
+# passed as a callable returning a fresh iterator of raw DataFrames, because
+# the ANN path needs two passes: one to fit the scaler, one to transform.
+#
+#   chunks = csvChunks("db/big_extract.csv", chunksize=50_000)
+#   scaler = fitAnnStreaming(chunks)
+#   for df_ann in streamAnnPreProc(chunks, scaler):
+#       ...
+
+
+#import
+#--------------------------------------------------
+import pandas as pd
+import preprocess as pp
+#--------------------------------------------------
+
+#sources
+#--------------------------------------------------
+def csvChunks(path, chunksize=50_000):
+    return lambda: pd.read_csv(path, sep=";", chunksize=chunksize)
+
+def frameChunks(df, chunksize=50_000):
+    return lambda: (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+#--------------------------------------------------
+
+#stateless features
+#--------------------------------------------------
+def chunkFeatures(chunk):
+    feat = pp.buildFeatures(chunk)
+
+    #buildFeatures treats a single row as a student to score, but a 1-row tail
+    #chunk still belongs to the training set and must keep its target
+    raw = chunk.rename(columns=pp.conversion_dict)
+    if "target" in raw.columns and "targetInt" not in feat.columns:
+        feat["targetInt"] = raw["target"].map(pp.targetMap).astype("Int64")
+    return feat
+
+def streamPreProc(chunks):
+    #RF and HGB features carry no fitted state, so one pass is enough
+    for chunk in chunks():
+        yield chunkFeatures(chunk)
+#--------------------------------------------------
+
+#ANN
+#--------------------------------------------------
+def fitAnnStreaming(chunks):
+    scaler = pp.AnnScaler()
+    for chunk in chunks():
+        scaler.partialFit(pp.annEncode(chunkFeatures(chunk)))
+    return scaler
+
+def streamAnnPreProc(chunks, scaler=None, columns=None):
+    #the one-hot vocabulary is fixed, so every chunk gets the same columns
+    if scaler is None:
+        scaler = fitAnnStreaming(chunks)
+    encoder = pp.AnnEncoder(columns)
+
+    for chunk in chunks():
+        yield pp.annFromFeatures(chunkFeatures(chunk), scaler, encoder)
+#--------------------------------------------------
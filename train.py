@@ -0,0 +1,268 @@
+# train.py
+# Scriptable version of the notebook's rfTrainEval / annTrainEval /
+# hgbTrainEval. Features and the train/test split are computed once and
+# shared; the three pipelines then train concurrently in a process pool.
+# Artifacts are written to temporary files and only moved over models/ once
+# every pipeline has succeeded. models/commit.json records the set before the
+# moves and is marked complete after them, so the app refuses a set that a
+# crash left half updated instead of loading it.
+#
+#   python train.py
+#   python train.py --models ANN HistGradientBoosting --workers 2
+
+
+#import
+#--------------------------------------------------
+import argparse
+import json
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import preprocess as pp
+import dataset
+import inference
+import importance as imp
+import bundle
+
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
+from sklearn.impute import SimpleImputer
+from sklearn.neural_network import MLPClassifier
+from imblearn.over_sampling import SMOTE
+#--------------------------------------------------
+
+#params
+#--------------------------------------------------
+#what the notebook trains the saved models with
+MODEL_PARAMS = {
+    "RandomForest": {"n_estimators": 300, "max_depth": None, "random_state": 42, "class_weight": None},
+    "ANN": {
+        "hidden_layer_sizes": (64, 32),
+        "activation": "relu",
+        "max_iter": 300,
+        "early_stopping": True,
+        "validation_fraction": 0.1,
+        "learning_rate": "adaptive",
+        "random_state": 42,
+        "verbose": False,
+    },
+    "HistGradientBoosting": {"learning_rate": 0.1, "max_iter": 100, "max_depth": 7, "random_state": 42},
+}
+
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+#--------------------------------------------------
+
+#split
+#--------------------------------------------------
+def splitIndices(y, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    #same call as the notebook; every pipeline has the same rows and target,
+    #so one set of positions reproduces each of their splits
+    positions = np.arange(len(y))
+    train_idx, test_idx = train_test_split(positions, test_size=test_size, random_state=random_state, stratify=y)
+    return train_idx, test_idx
+
+def splitFrame(df, split):
+    train_idx, test_idx = split
+    X = df.drop("targetInt", axis=1)
+    y = df["targetInt"]
+    return X.iloc[train_idx], X.iloc[test_idx], y.iloc[train_idx], y.iloc[test_idx]
+
+def evaluate(y_test, y_pred):
+    return {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, average="macro"),
+        "recall": recall_score(y_test, y_pred, average="macro"),
+        "f1": f1_score(y_test, y_pred, average="macro"),
+        "report": classification_report(y_test, y_pred),
+    }
+#--------------------------------------------------
+
+#pipelines
+#--------------------------------------------------
+def rfTrainEval(df_rf, split, **params_rf):
+    X_train, X_test, y_train, y_test = splitFrame(df_rf, split)
+
+    #impute missing val
+    imputer = SimpleImputer(strategy="mean")
+    X_train_imputed = pd.DataFrame(imputer.fit_transform(X_train), columns=X_train.columns)
+    X_test_imputed = pd.DataFrame(imputer.transform(X_test), columns=X_test.columns)
+
+    #resample for minority
+    smote = SMOTE(random_state=42)
+    X_train_imputed_resampled, y_train_resampled = smote.fit_resample(X_train_imputed, y_train)
+
+    #train
+    model_rf = RandomForestClassifier(**params_rf)
+    model_rf.fit(X_train_imputed_resampled, y_train_resampled)
+    metrics = evaluate(y_test, model_rf.predict(X_test_imputed))
+    metrics["importance"] = pd.Series(model_rf.feature_importances_, index=X_train.columns).sort_values(ascending=False)
+
+    return {"model": model_rf, "imputer": imputer, "columns": list(X_train.columns)}, metrics
+
+def annTrainEval(df_ann, split, scaler, **params_ann):
+    X_train, X_test, y_train, y_test = splitFrame(df_ann, split)
+
+    #resample for minority
+    sm = SMOTE(random_state=42)
+    X_train_resampled, y_train_resampled = sm.fit_resample(X_train, y_train)
+
+    #train
+    model_ann = MLPClassifier(**params_ann)
+    model_ann.fit(X_train_resampled, y_train_resampled)
+    metrics = evaluate(y_test, model_ann.predict(X_test))
+
+    return {"model": model_ann, "scalers": scaler.toArtifact(), "columns": list(X_train.columns)}, metrics
+
+def hgbTrainEval(df_hgb, split, importance=True, importance_groups=None, importance_tol=0, **params_hgb):
+    X_train, X_test, y_train, y_test = splitFrame(df_hgb, split)
+
+    #impute
+    imputer = SimpleImputer(strategy="mean")
+    X_train_imp = pd.DataFrame(imputer.fit_transform(X_train), columns=X_train.columns)
+    X_test_imp = pd.DataFrame(imputer.transform(X_test), columns=X_test.columns)
+
+    #resample for minority
+    smote = SMOTE(random_state=42)
+    X_resampled, y_resampled = smote.fit_resample(X_train_imp, y_train)
+
+    #train
+    model_hgb = HistGradientBoostingClassifier(**params_hgb)
+    model_hgb.fit(X_resampled, y_resampled)
+    metrics = evaluate(y_test, model_hgb.predict(X_test_imp))
+
+    if importance:
+        #tol=0 runs all 10 repeats like the notebook; a tolerance opts in to early stopping
+        metrics["importance"] = imp.permutationImportance(model_hgb, X_test_imp, y_test, groups=importance_groups, n_repeats=10, tol=importance_tol, random_state=42)
+
+    return {"model": model_hgb, "imputer": imputer, "columns": list(X_train.columns)}, metrics
+#--------------------------------------------------
+
+#artifacts
+#--------------------------------------------------
+def artifactPath(model_name, kind, out_dir="models"):
+    return os.path.join(out_dir, os.path.basename(inference.MODEL_FILES[model_name][kind]))
+
+def dumpTemporary(artifacts, model_name, out_dir="models"):
+    #written next to the target so the final os.replace stays on one filesystem
+    written = {}
+    for kind, obj in artifacts.items():
+        path = artifactPath(model_name, kind, out_dir)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        joblib.dump(obj, tmp)
+        written[tmp] = path
+
+    #the bundle goes last, so it is newer than the pickles and inference picks it up
+    path = os.path.join(out_dir, os.path.basename(bundle.BUNDLE_FILES[model_name]))
+    tmp = f"{path}.tmp-{os.getpid()}"
+    bundle.writeBundle(model_name, artifacts, tmp, bundle.manifestPath(tmp))
+    written[tmp] = path
+    written[bundle.manifestPath(tmp)] = bundle.manifestPath(path)
+    return written
+
+def writeCommit(path, files, complete):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump({"complete": complete, "files": files}, f, indent=2)
+    os.replace(tmp, path)
+
+def commitArtifacts(written, out_dir="models"):
+    #os.replace is atomic per file only, so the set is recorded first and marked
+    #complete last: inference refuses a set that a crash left half moved
+    path = os.path.join(out_dir, os.path.basename(inference.COMMIT_FILE))
+    files = {os.path.relpath(dest, out_dir): {"old": inference.signatureOrNone(dest), "new": inference.signatureOrNone(tmp)} for tmp, dest in written.items()}
+    writeCommit(path, files, complete=False)
+    for tmp, dest in written.items():
+        os.replace(tmp, dest)
+    writeCommit(path, files, complete=True)
+
+def discardArtifacts(written):
+    for tmp in written:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+#--------------------------------------------------
+
+#driver
+#--------------------------------------------------
+def trainModel(model_name, feat, split, params, out_dir="models", **options):
+    start = time.perf_counter()
+
+    if model_name == "RandomForest":
+        artifacts, metrics = rfTrainEval(pp.rfFromFeatures(feat), split, **params)
+    elif model_name == "ANN":
+        df_ann = pp.annEncode(feat)
+        scaler = pp.AnnScaler().fit(df_ann)
+        artifacts, metrics = annTrainEval(scaler.transform(df_ann), split, scaler, **params)
+    elif model_name == "HistGradientBoosting":
+        artifacts, metrics = hgbTrainEval(pp.hgbFromFeatures(feat), split, **options, **params)
+    else:
+        raise ValueError(f"Unknown model {model_name!r}, expected one of {inference.MODEL_NAMES}")
+
+    written = dumpTemporary(artifacts, model_name, out_dir)
+    return {"model": model_name, "seconds": time.perf_counter() - start, "metrics": metrics, "written": written}
+
+def trainAll(df=None, models=inference.MODEL_NAMES, workers=None, out_dir="models", params=None, **options):
+    params = {**MODEL_PARAMS, **(params or {})}
+
+    start = time.perf_counter()
+    feat = dataset.features(df)
+    split = splitIndices(feat["targetInt"])
+    shared_s = time.perf_counter() - start
+
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers or len(models)) as pool:
+        futures = [pool.submit(trainModel, name, feat, split, params[name], out_dir, **(options if name == "HistGradientBoosting" else {})) for name in models]
+
+    #the pool has drained here, so a failure leaves models/ untouched
+    results = [future.result() for future in futures if future.exception() is None]
+    failed = [future.exception() for future in futures if future.exception() is not None]
+    if failed:
+        for result in results:
+            discardArtifacts(result["written"])
+        raise failed[0]
+
+    #only now replace what the app loads, all models together
+    commitArtifacts({tmp: path for result in results for tmp, path in result.pop("written").items()}, out_dir)
+
+    wall = time.perf_counter() - start
+    sum_of_parts = shared_s + sum(r["seconds"] for r in results)
+    return {"results": results, "sharedSeconds": shared_s, "wallSeconds": wall, "sumOfPartsSeconds": sum_of_parts, "speedup": sum_of_parts / wall}
+
+def printReport(report):
+    for result in report["results"]:
+        m = result["metrics"]
+        print(f"{result['model']:<25}: {result['seconds']:7.2f}s | Accuracy: {m['accuracy']:.4f} | Precision: {m['precision']:.4f} | Recall: {m['recall']:.4f} | F1: {m['f1']:.4f}")
+    print(f"{'features + split':<25}: {report['sharedSeconds']:7.2f}s")
+    print(f"{'sum of parts':<25}: {report['sumOfPartsSeconds']:7.2f}s")
+    print(f"{'wall clock':<25}: {report['wallSeconds']:7.2f}s ({report['speedup']:.2f}x)")
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and save the RandomForest, ANN and HistGradientBoosting models.")
+    parser.add_argument("--models", nargs="+", choices=inference.MODEL_NAMES, default=inference.MODEL_NAMES)
+    parser.add_argument("--workers", type=int, help="training processes (default: one per model)")
+    parser.add_argument("--out", default="models", help="artifact directory")
+    parser.add_argument("--no-importance", action="store_true", help="skip HistGradientBoosting permutation importance")
+    parser.add_argument("--importance-groups", action="store_true", help="permute related columns together in the importance")
+    parser.add_argument("--importance-tol", type=float, default=0, help="stop importance repeats once the std-error of the mean drop is below this (default: all 10, as in the notebook)")
+    parser.add_argument("--tuned", action="store_true", help="use the best parameters saved by tune.py")
+    parser.add_argument("--verbose", action="store_true", help="print each classification report")
+    args = parser.parse_args()
+
+    params = None
+    if args.tuned:
+        import tune
+        params = {name: {**MODEL_PARAMS[name], **tune.loadTunedParams(name)} for name in args.models}
+        print(f"parameters: {params}")
+
+    report = trainAll(models=args.models, workers=args.workers, out_dir=args.out, params=params, importance=not args.no_importance, importance_groups=imp.DEFAULT_GROUPS if args.importance_groups else None, importance_tol=args.importance_tol)
+    printReport(report)
+    if args.verbose:
+        for result in report["results"]:
+            print(f"\n{result['model']}\n{result['metrics']['report']}")
@@ -0,0 +1,147 @@
+# trees.py
+# Tree ensembles as flat node arrays. Every tree of a RandomForest or
+# HistGradientBoosting model is copied into one set of contiguous arrays
+# (feature, threshold, left, right, missing_left, leaf value), and a batch is
+# scored by walking all rows through all trees at once with NumPy, one level
+# per step. Summation order, float32 input for RF and the softmax for HGB
+# follow sklearn, so the result matches sklearn's predict_proba bit for bit.
+#
+#   flat = flattenModel(model)
+#   proba = flat.predict_proba(X)        # X in the model's column order
+
+
+#import
+#--------------------------------------------------
+import numpy as np
+#--------------------------------------------------
+
+#flat ensemble
+#--------------------------------------------------
+class FlatForest:
+    def __init__(self, kind, classes, feature, threshold, left, right, missing_left, value, roots, depth, baseline=None):
+        self.kind = kind
+        self.classes_ = np.asarray(classes)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.baseline = baseline
+
+    def apply(self, X):
+        #leaf node of every (row, tree); leaves point to themselves, so
+        #running depth steps lands every row on its leaf
+        n = len(X)
+        rows = np.arange(n)[:, None]
+        node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    #sklearn method names, so inference.scoreModel takes either
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.kind == "rf":
+            #sklearn trees compare float32 features against float64 thresholds
+            leaves = self.apply(X.astype(np.float32).astype(np.float64))
+            #RandomForest adds the trees one after another, then divides; cumsum keeps that order
+            return self.value[leaves].cumsum(axis=1)[:, -1] / len(self.roots)
+
+        leaves = self.apply(X)
+        n, k = len(X), len(self.baseline)
+        #raw = baseline + tree values, added iteration by iteration per class
+        values = self.value[leaves].reshape(n, -1, k)
+        raw = np.concatenate([np.broadcast_to(self.baseline, (n, 1, k)), values], axis=1).cumsum(axis=1)[:, -1]
+        if k == 1:
+            p = 1 / (1 + np.exp(-raw[:, 0]))
+            return np.column_stack([1 - p, p])
+        proba = np.exp(raw - raw.max(axis=1, keepdims=True))
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    @classmethod
+    def fromModel(cls, model):
+        return flattenModel(model)
+
+    def toArtifact(self):
+        return {name: value for name, value in vars(self).items()}
+
+    @classmethod
+    def fromArtifact(cls, artifact):
+        if isinstance(artifact, cls):
+            return artifact
+        artifact = dict(artifact)
+        artifact["classes"] = artifact.pop("classes_")
+        return cls(**artifact)
+#--------------------------------------------------
+
+#export
+#--------------------------------------------------
+def concatNodes(trees):
+    #trees: (feature, threshold, left, right, missing_left, value, is_leaf) per tree, node ids local
+    offsets = np.cumsum([0] + [len(t[0]) for t in trees])
+    feature, threshold, left, right, missing_left, value, roots = [], [], [], [], [], [], []
+    for offset, (f, th, l, r, ml, v, leaf) in zip(offsets, trees):
+        ids = np.arange(len(f)) + offset
+        feature.append(np.where(leaf, 0, f))
+        threshold.append(np.where(leaf, np.inf, th))
+        left.append(np.where(leaf, ids, l + offset))
+        right.append(np.where(leaf, ids, r + offset))
+        missing_left.append(np.where(leaf, True, ml))
+        value.append(v)
+        roots.append(offset)
+    return (
+        np.ascontiguousarray(np.concatenate(feature), dtype=np.intp),
+        np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64),
+        np.ascontiguousarray(np.concatenate(left), dtype=np.intp),
+        np.ascontiguousarray(np.concatenate(right), dtype=np.intp),
+        np.ascontiguousarray(np.concatenate(missing_left), dtype=bool),
+        np.ascontiguousarray(np.concatenate(value), dtype=np.float64),
+        np.asarray(roots, dtype=np.intp),
+    )
+
+def flattenRandomForest(model):
+    trees = []
+    for est in model.estimators_:
+        t = est.tree_
+        leaf = t.children_left == -1
+        #DecisionTreeClassifier.predict_proba: leaf value over its sum, 0 sums left as is
+        value = t.value[:, 0, :model.n_classes_]
+        normalizer = value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        trees.append((t.feature, t.threshold, t.children_left, t.children_right, t.missing_go_to_left.astype(bool), value / normalizer, leaf))
+    feature, threshold, left, right, missing_left, value, roots = concatNodes(trees)
+    depth = max(est.tree_.max_depth for est in model.estimators_)
+    return FlatForest("rf", model.classes_, feature, threshold, left, right, missing_left, value, roots, depth)
+
+def flattenHistGradientBoosting(model):
+    #tree order is iteration-major (it0 class0, it0 class1, ...), which predict_proba relies on
+    trees = []
+    depth = 0
+    for predictors in model._predictors:
+        for predictor in predictors:
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise ValueError("categorical splits are not supported by the flat HistGradientBoosting path")
+            leaf = nodes["is_leaf"].astype(bool)
+            trees.append((nodes["feature_idx"], nodes["num_threshold"], nodes["left"].astype(np.intp), nodes["right"].astype(np.intp), nodes["missing_go_to_left"].astype(bool), nodes["value"], leaf))
+            depth = max(depth, int(nodes["depth"].max()))
+    feature, threshold, left, right, missing_left, value, roots = concatNodes(trees)
+    baseline = np.asarray(model._baseline_prediction, dtype=np.float64).reshape(-1)
+    return FlatForest("hgb", model.classes_, feature, threshold, left, right, missing_left, value, roots, depth, baseline)
+
+def flattenModel(model):
+    name = type(model).__name__
+    if name == "RandomForestClassifier":
+        return flattenRandomForest(model)
+    if name == "HistGradientBoostingClassifier":
+        return flattenHistGradientBoosting(model)
+    raise ValueError(f"Cannot flatten {name}, expected RandomForestClassifier or HistGradientBoostingClassifier")
+#--------------------------------------------------
@@ -0,0 +1,172 @@
+# tune.py
+# Hyperparameter search for the three models on GridSearchCV (or its
+# successive-halving variant). Imputation and SMOTE happen per CV fold in
+# resample.py, once per fold and cached on disk, so candidates only fit the
+# model and resampling never sees the validation fold.
+#
+#   python tune.py HistGradientBoosting --halving
+#   python train.py --tuned
+
+
+#import
+#--------------------------------------------------
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+import preprocess as pp
+import dataset
+import inference
+import train
+import resample
+
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.neural_network import MLPClassifier
+#--------------------------------------------------
+
+#search spaces
+#--------------------------------------------------
+#each grid contains the notebook's values, so the current models are a candidate
+SEARCH_SPACES = {
+    "RandomForest": {
+        "n_estimators": [100, 300, 500],
+        "max_depth": [None, 10, 20],
+        "min_samples_leaf": [1, 2, 4],
+    },
+    "ANN": {
+        "hidden_layer_sizes": [(64, 32), (128, 64), (64,)],
+        "alpha": [1e-4, 1e-3, 1e-2],
+        "learning_rate_init": [1e-3, 1e-2],
+    },
+    "HistGradientBoosting": {
+        "learning_rate": [0.05, 0.1, 0.2],
+        "max_iter": [100, 200],
+        "max_depth": [5, 7, None],
+        "l2_regularization": [0.0, 1.0],
+    },
+}
+
+CACHE_DIR = resample.CACHE_DIR
+RESULTS_DIR = "models/search"
+SCORING = "f1_macro"
+#--------------------------------------------------
+
+#pipeline
+#--------------------------------------------------
+def estimator(model_name, **params):
+    params = {**train.MODEL_PARAMS[model_name], **params}
+    if model_name == "RandomForest":
+        return RandomForestClassifier(**params)
+    if model_name == "ANN":
+        return MLPClassifier(**params)
+    if model_name == "HistGradientBoosting":
+        return HistGradientBoostingClassifier(**params)
+    raise ValueError(f"Unknown model {model_name!r}, expected one of {inference.MODEL_NAMES}")
+
+def foldCache(model_name, cache_dir=CACHE_DIR):
+    #the ANN frame is min-max scaled with no missing values, and the notebook never imputes it
+    return resample.FoldCache(cache_dir, impute=model_name != "ANN")
+
+def modelFrame(model_name, feat):
+    if model_name == "RandomForest":
+        return pp.rfFromFeatures(feat)
+    if model_name == "ANN":
+        df_ann = pp.annEncode(feat)
+        return pp.AnnScaler().fit(df_ann).transform(df_ann)
+    if model_name == "HistGradientBoosting":
+        return pp.hgbFromFeatures(feat)
+    raise ValueError(f"Unknown model {model_name!r}, expected one of {inference.MODEL_NAMES}")
+#--------------------------------------------------
+
+#search
+#--------------------------------------------------
+def search(model_name, df=None, grid=None, halving=False, cv=5, n_jobs=-1, cache_dir=CACHE_DIR, verbose=0):
+    grid = SEARCH_SPACES[model_name] if grid is None else grid
+
+    #search on the training part of train.py's split, keep its test part for the final score
+    feat = dataset.features(df)
+    split = train.splitIndices(feat["targetInt"])
+    X_train, X_test, y_train, y_test = train.splitFrame(modelFrame(model_name, feat), split)
+
+    cache = foldCache(model_name, cache_dir)
+    X_stack, y_stack, splits = resample.stackFolds(X_train, y_train, cv, train.RANDOM_STATE, cache)
+
+    #refit=False: the stacked matrix holds every fold, the final model is refit below
+    options = {"scoring": SCORING, "cv": splits, "n_jobs": n_jobs, "verbose": verbose, "refit": False}
+    if halving:
+        searcher = HalvingGridSearchCV(estimator(model_name), grid, factor=3, random_state=train.RANDOM_STATE, **options)
+    else:
+        searcher = GridSearchCV(estimator(model_name), grid, **options)
+
+    start = time.perf_counter()
+    searcher.fit(X_stack, y_stack)
+    full = resample.resampledTrain(X_train, y_train, cache)
+    best = estimator(model_name, **searcher.best_params_).fit(pd.DataFrame(full["X_train"], columns=X_train.columns), full["y_train"])
+    seconds = time.perf_counter() - start
+
+    if full["imputer"] is not None:
+        X_test = pd.DataFrame(full["imputer"].transform(X_test), columns=X_test.columns)
+    test = train.evaluate(y_test, best.predict(X_test))
+    return {
+        "model": model_name,
+        "strategy": "halving" if halving else "grid",
+        "candidates": len(searcher.cv_results_["params"]),
+        "seconds": seconds,
+        "bestParams": searcher.best_params_,
+        "bestCvScore": searcher.best_score_,
+        "test": {key: value for key, value in test.items() if key != "report"},
+        "cvResults": pd.DataFrame(searcher.cv_results_),
+        "foldCache": cache.stats(),
+    }
+#--------------------------------------------------
+
+#results
+#--------------------------------------------------
+def resultPaths(model_name, results_dir=RESULTS_DIR):
+    stem = os.path.join(results_dir, os.path.basename(inference.MODEL_FILES[model_name]["model"]).removesuffix(".pkl"))
+    return f"{stem}_search.json", f"{stem}_search.csv"
+
+def saveSearch(result, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    json_path, csv_path = resultPaths(result["model"], results_dir)
+    result["cvResults"].to_csv(csv_path, sep=";", index=False)
+    summary = {key: value for key, value in result.items() if key != "cvResults"}
+    #tuples (hidden_layer_sizes) come back as lists from JSON; loadTunedParams turns them back
+    with open(json_path, "w") as f:
+        json.dump(summary, f, indent=2, default=str)
+    return json_path, csv_path
+
+def loadTunedParams(model_name, results_dir=RESULTS_DIR):
+    json_path, _ = resultPaths(model_name, results_dir)
+    if not os.path.exists(json_path):
+        return {}
+    with open(json_path) as f:
+        params = json.load(f)["bestParams"]
+    if "hidden_layer_sizes" in params:
+        params["hidden_layer_sizes"] = tuple(params["hidden_layer_sizes"])
+    return params
+#--------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid search hyperparameters with imputation and SMOTE inside the CV folds.")
+    parser.add_argument("models", nargs="*", help=f"any of {inference.MODEL_NAMES} (default: all)")
+    parser.add_argument("--halving", action="store_true", help="successive halving: prune bad candidates on a subsample first")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fold fits (default: all cores)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where resampled folds are cached")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.models if name not in inference.MODEL_NAMES]
+    if unknown:
+        parser.error(f"unknown model(s) {unknown}, expected any of {inference.MODEL_NAMES}")
+
+    for model_name in args.models or inference.MODEL_NAMES:
+        result = search(model_name, halving=args.halving, cv=args.cv, n_jobs=args.jobs, cache_dir=args.cache_dir)
+        json_path, _ = saveSearch(result, args.results_dir)
+        print(f"{model_name:<25}: {result['candidates']} candidates in {result['seconds']:.1f}s | CV {SCORING}: {result['bestCvScore']:.4f} | test F1: {result['test']['f1']:.4f}")
+        print(f"{'':<25}  {result['bestParams']} -> {json_path}")